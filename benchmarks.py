@@ -0,0 +1,1081 @@
+"""
+Performance benchmarks.
+
+Usage:
+    python benchmarks.py <benchmark> [args...]
+
+Each benchmark prints its own table. Synthetic STEP files are written to a temporary directory.
+"""
+import os
+import subprocess
+import sys
+import gc
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+
+from geometry import Step_read, Data_sort, Make_entity, Resolve, Geom_dict, Parse_points, Cartesian_point, POINT_TAGS
+from geometry import Polyline, Circle, B_spline_curve_with_knots, Discretise_curves, Unique_nodes
+from fixtures import Write_synthetic_step, Write_grid_step, Mesh_defects
+
+def Write_naca_step(file:str,chord:float=100.,n_points:int=61)->None:
+    """
+    Writes a STEP file with one planar NACA0012 face: a cubic B-spline through cosine spaced section
+    points from the upper trailing edge round the leading edge to the lower one, closed by a LINE
+    across the blunt trailing edge.
+    """
+    from scipy.interpolate import make_interp_spline
+
+    x=chord*(1-np.cos(np.linspace(0,np.pi,n_points)))/2
+    xc=x/chord
+    y=0.6*chord*(0.2969*np.sqrt(xc)-0.1260*xc-0.3516*xc**2+0.2843*xc**3-0.1015*xc**4)
+    points=np.stack([np.concatenate([x[::-1],x[1:]]),np.concatenate([y[::-1],-y[1:]])],axis=1)
+
+    u=np.concatenate(([0.],np.cumsum(np.linalg.norm(np.diff(points,axis=0),axis=1))))
+    spline=make_interp_spline(u/u[-1],points,k=3)
+    knots,multiplicities=np.unique(spline.t,return_counts=True)
+    ctrl=spline.c.tolist()
+
+    lines=[
+        "ISO-10303-21;",
+        "HEADER;",
+        "FILE_DESCRIPTION((''),'2;1');",
+        "FILE_NAME('naca0012.stp','',(''),(''),'','','');",
+        "FILE_SCHEMA (('AUTOMOTIVE_DESIGN { 1 0 10303 214 3 1 1 }'));",
+        "ENDSEC;",
+        "",
+        "DATA;",
+        "#1=ADVANCED_FACE('',(#2),#3,.T.);",
+        "#2=FACE_OUTER_BOUND('',#4,.T.);",
+        "#3=PLANE('',#5);",
+        "#4=EDGE_LOOP('',(#10,#11));",
+        "#5=AXIS2_PLACEMENT_3D('',#6,#7,#8);",
+        "#6=CARTESIAN_POINT('',(0.,0.,0.));",
+        "#7=DIRECTION('',(0.,0.,1.));",
+        "#8=DIRECTION('',(1.,0.,0.));",
+        "#10=ORIENTED_EDGE('',*,*,#12,.T.);",
+        "#11=ORIENTED_EDGE('',*,*,#13,.T.);",
+        "#12=EDGE_CURVE('',#14,#15,#20,.T.);",
+        "#13=EDGE_CURVE('',#15,#14,#21,.T.);",
+        "#14=VERTEX_POINT('',#100);",
+        f"#15=VERTEX_POINT('',#{100+len(ctrl)-1});",
+        "#16=DIRECTION('',(0.,1.,0.));",
+        f"#17=VECTOR('',#16,{2*ctrl[0][1]!r});",
+        "#20=B_SPLINE_CURVE_WITH_KNOTS('',3,(%s),.UNSPECIFIED.,.F.,.F.,(%s),(%s),.UNSPECIFIED.);"%(
+            ",".join(f"#{100+i}" for i in range(len(ctrl))),
+            ",".join(str(m) for m in multiplicities.tolist()),
+            ",".join(repr(k) for k in knots.tolist()),
+        ),
+        f"#21=LINE('',#{100+len(ctrl)-1},#17);",
+    ]
+    lines+=[f"#{100+i}=CARTESIAN_POINT('',({px!r},{py!r},0.));" for i,(px,py) in enumerate(ctrl)]
+    lines.extend(["ENDSEC;","END-ISO-10303-21;",""])
+
+    with open(file,'w') as f:
+        f.write("\n".join(lines))
+
+    return None
+
+def bench_step_read(max_entities:int=10**6)->None:
+    """Step_read time per entity, from the bundled circle.stp up to synthetic files of max_entities."""
+    print(f"{'file':>24} {'entities':>10} {'time [s]':>10} {'us/entity':>10}")
+
+    here=os.path.dirname(os.path.abspath(__file__))
+    t0=perf_counter()
+    data=Step_read(os.path.join(here,'circle.stp'))
+    dt=perf_counter()-t0
+    print(f"{'circle.stp':>24} {len(data):>10} {dt:>10.4f} {1e6*dt/len(data):>10.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        n_entities=1000
+        while n_entities<=max_entities:
+            file=os.path.join(tmp,f'synthetic_{n_entities}.stp')
+            Write_synthetic_step(file,n_edges=max(3,n_entities//7))
+
+            t0=perf_counter()
+            data=Step_read(file)
+            dt=perf_counter()-t0
+            print(f"{os.path.basename(file):>24} {len(data):>10} {dt:>10.4f} {1e6*dt/len(data):>10.2f}")
+
+            n_entities*=10
+
+    return None
+
+def bench_step_mmap(n_unused:int=10**5,n_edges:int=1000)->None:
+    """Peak traced memory of Step_read+Data_sort, in memory vs memory-mapped, as unrelated entities grow."""
+    print(f"{'entities':>10} {'mode':>8} {'time [s]':>10} {'peak [MB]':>10} {'objects':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        n=n_unused//100
+        while n<=n_unused:
+            file=os.path.join(tmp,f'synthetic_{n}.stp')
+            n_entities=Write_synthetic_step(file,n_edges=n_edges,n_unused=n)
+
+            for mmap in (False,True):
+                tracemalloc.start()
+                t0=perf_counter()
+                data=Step_read(file,mmap=mmap)
+                geom_dict=Data_sort(data)
+                dt=perf_counter()-t0
+                peak=tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                print(f"{n_entities:>10} {'mmap' if mmap else 'memory':>8} {dt:>10.3f} {peak/2**20:>10.1f} {len(geom_dict):>10}")
+                if mmap:
+                    data.close()
+                del data,geom_dict
+
+            n*=10
+
+    return None
+
+def bench_prune(n_unused:int=10**5,n_edges:int=1000)->None:
+    """Data_sort time, full vs reachability-pruned, for one face as unrelated entities grow."""
+    print(f"{'entities':>10} {'full [s]':>10} {'pruned [s]':>10} {'full objs':>10} {'pruned objs':>12}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        n=n_unused//100
+        while n<=n_unused:
+            file=os.path.join(tmp,f'synthetic_{n}.stp')
+            n_entities=Write_synthetic_step(file,n_edges=n_edges,n_unused=n)
+            data=Step_read(file)
+
+            t0=perf_counter()
+            full=Data_sort(data)
+            t1=perf_counter()
+            pruned=Data_sort(data,prune=True)
+            t2=perf_counter()
+
+            print(f"{n_entities:>10} {t1-t0:>10.3f} {t2-t1:>10.3f} {len(full):>10} {len(pruned):>12}")
+
+            n*=10
+
+    return None
+
+def bench_data_sort(max_entities:int=10**6)->None:
+    """Entity construction (registry dispatch) and resolution (fill_data) throughput in entities/s."""
+    print(f"{'entities':>10} {'construct [s]':>14} {'resolve [s]':>12} {'entities/s':>12}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        n_entities=1000
+        while n_entities<=max_entities:
+            file=os.path.join(tmp,f'synthetic_{n_entities}.stp')
+            Write_synthetic_step(file,n_edges=max(3,n_entities//7))
+            data=Step_read(file)
+
+            t0=perf_counter()
+            geom_dict=Geom_dict(Parse_points(data))
+            for row in data:
+                if row['tag'] not in POINT_TAGS:
+                    x=Make_entity(row)
+                    geom_dict[x.id]=x
+            t1=perf_counter()
+            Resolve(geom_dict)
+            t2=perf_counter()
+
+            print(f"{len(data):>10} {t1-t0:>14.3f} {t2-t1:>12.3f} {len(data)/(t2-t0):>12.0f}")
+
+            n_entities*=10
+
+    return None
+
+def bench_geom_cache(n_edges:int=10**5)->None:
+    """mesh.read cold (parse + store) vs warm (cache hit) on shape.stp and a synthetic face."""
+    import mesh
+    from geom_cache import Geom_cache
+
+    print(f"{'file':>24} {'cold [s]':>10} {'warm [s]':>10} {'entry [kB]':>11}")
+
+    here=os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic=os.path.join(tmp,f'synthetic_{n_edges}.stp')
+        Write_synthetic_step(synthetic,n_edges=n_edges)
+        cache=Geom_cache(os.path.join(tmp,'cache'))
+
+        for file in (os.path.join(here,'shape.stp'),synthetic):
+            t0=perf_counter()
+            mesh.read(file,cache=cache)
+            t1=perf_counter()
+            mesh.read(file,cache=cache)
+            t2=perf_counter()
+
+            size=os.path.getsize(cache.path(cache.key(file,{'prune':True,'compact':False})))
+            print(f"{os.path.basename(file):>24} {t1-t0:>10.4f} {t2-t1:>10.4f} {size/1024:>11.1f}")
+
+    return None
+
+def bench_point_store(n_points:int=10**5)->None:
+    """Memory per point and control-point gather time, Cartesian_point objects vs the Point_store."""
+    with tempfile.TemporaryDirectory() as tmp:
+        file=os.path.join(tmp,'points.stp')
+        Write_synthetic_step(file,n_edges=3,n_unused=n_points)
+        data=Step_read(file)
+        rows=[x for x in data if x['tag']=='CARTESIAN_POINT']
+
+        tracemalloc.start()
+        objects={x['id']:Cartesian_point(x) for x in rows}
+        object_bytes=tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        store=Parse_points(data)
+        store_bytes=tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        ids=list(objects)
+        t0=perf_counter()
+        np.array([objects[x].coords for x in ids])
+        t1=perf_counter()
+        store[ids]
+        t2=perf_counter()
+
+    print(f"{'':>14} {'bytes/point':>12} {'gather [s]':>11}")
+    print(f"{'objects':>14} {object_bytes/len(rows):>12.1f} {t1-t0:>11.4f}")
+    print(f"{'Point_store':>14} {store_bytes/len(store):>12.1f} {t2-t1:>11.4f}")
+
+    return None
+
+def bench_entity_memory(n_edges:int=10**5)->None:
+    """Traced bytes per entity held by the Data_sort result, with and without compact=True."""
+    with tempfile.TemporaryDirectory() as tmp:
+        file=os.path.join(tmp,f'synthetic_{n_edges}.stp')
+        n_entities=Write_synthetic_step(file,n_edges=n_edges)
+        data=Step_read(file)
+
+        print(f"{'compact':>8} {'entities':>10} {'bytes/entity':>13}")
+        for compact in (False,True):
+            gc.collect()
+            tracemalloc.start()
+            geom_dict=Data_sort(data,compact=compact)
+            held=tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            print(f"{str(compact):>8} {n_entities:>10} {held/n_entities:>13.1f}")
+            del geom_dict
+
+    return None
+
+def bench_parallel_decode(n_entities:int=10**6,max_workers:int=None)->None:
+    """Step_read+Data_sort wall time for 1,2,4.. worker processes. Checks output against serial."""
+    if max_workers is None:
+        max_workers=os.cpu_count()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file=os.path.join(tmp,f'synthetic_{n_entities}.stp')
+        Write_synthetic_step(file,n_edges=n_entities//7)
+
+        print(f"{'workers':>8} {'read [s]':>10} {'sort [s]':>10} {'identical':>10}")
+        reference=None
+        workers=1
+        while workers<=max_workers:
+            t0=perf_counter()
+            data=Step_read(file,workers=workers)
+            t1=perf_counter()
+            geom_dict=Data_sort(data,workers=workers)
+            t2=perf_counter()
+
+            points=(geom_dict.points.ids,geom_dict.points.coords)
+            if reference is None:
+                reference=(list(geom_dict),points)
+            identical=list(geom_dict)==reference[0] and all([np.array_equal(a,b) for a,b in zip(points,reference[1])])
+
+            print(f"{workers:>8} {t1-t0:>10.3f} {t2-t1:>10.3f} {str(identical):>10}")
+            workers*=2
+
+    return None
+
+STARTUP_PROBE="""
+from time import perf_counter
+t0=perf_counter()
+import geometry
+t1=perf_counter()
+import mesh
+t2=perf_counter()
+mesh.warmup()
+t3=perf_counter()
+print(t1-t0,t2-t1,t3-t2)
+"""
+
+def bench_startup(runs:int=3)->None:
+    """Import and first JIT call latency in fresh processes, with a cold then warm numba cache."""
+    here=os.path.dirname(os.path.abspath(__file__))
+
+    print(f"{'run':>6} {'import geometry [s]':>20} {'import mesh [s]':>16} {'first call [s]':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        env=dict(os.environ,NUMBA_CACHE_DIR=tmp)
+        for run in range(runs):
+            out=subprocess.run([sys.executable,"-c",STARTUP_PROBE],cwd=here,env=env,capture_output=True,text=True,check=True)
+            geometry_,mesh_,first=[float(x) for x in out.stdout.split()]
+            print(f"{'cold' if run==0 else 'warm':>6} {geometry_:>20.3f} {mesh_:>16.3f} {first:>15.3f}")
+
+    return None
+
+def Synthetic_curves(n_nodes:int,spacing:float=1.)->list:
+    """Half the nodes on straight edges of a polygon, half on full circles, each curve ~100 nodes."""
+    n_lines=n_circles=max(n_nodes//200,1)
+
+    theta=np.linspace(0,2*np.pi,n_lines+1)
+    radius=100*spacing*n_lines/(2*np.pi)
+    corners=np.stack([radius*np.cos(theta),radius*np.sin(theta),np.zeros_like(theta)],axis=1)
+    curves=[Polyline(points=corners[i:i+2]) for i in range(n_lines)]
+
+    for i in range(n_circles):
+        circle=Circle({'id':i,'properties':"'',#0,%r"%(100*spacing/(2*np.pi))})
+        circle.centre=np.array([0.,0.,float(i)])
+        circle.plane=[np.array([1.,0.,0.]),np.array([0.,1.,0.])]
+        curves.append(circle)
+
+    return curves
+
+def bench_curve_nodes(n_nodes:int=10**6)->None:
+    """Boundary discretisation time, per-curve gen_nodes vs one Discretise_curves batch."""
+    spacing=1.
+    curves=Synthetic_curves(n_nodes,spacing)
+
+    t0=perf_counter()
+    per_curve=[c.gen_nodes(spacing) for c in curves]
+    t1=perf_counter()
+    batched=Discretise_curves(curves,spacing)
+    t2=perf_counter()
+
+    assert all(np.array_equal(a,b) for a,b in zip(per_curve,batched))
+
+    total=sum(len(x) for x in batched)
+    print(f"{len(curves)} curves, {total} nodes")
+    print(f"{'':>18} {'time [s]':>9} {'nodes/s':>11}")
+    print(f"{'gen_nodes':>18} {t1-t0:>9.3f} {total/(t1-t0):>11.3g}")
+    print(f"{'Discretise_curves':>18} {t2-t1:>9.3f} {total/(t2-t1):>11.3g}")
+
+    return None
+
+def Synthetic_bspline(n_ctrl:int,wiggle:float,degree:int=3)->B_spline_curve_with_knots:
+    """Clamped B-spline along a 1000 long arc, control points displaced sideways by +-wiggle."""
+    from scipy.interpolate import BSpline
+
+    ids=",".join(f"#{i}" for i in range(n_ctrl))
+    multiplicities=",".join(str(x) for x in [degree+1]+[1]*(n_ctrl-degree-1)+[degree+1])
+    knots=",".join(repr(x) for x in np.linspace(0.,1.,n_ctrl-degree+1).tolist())
+    curve=B_spline_curve_with_knots({'id':0,'properties':f"'',{degree},({ids}),.UNSPECIFIED.,.F.,.F.,({multiplicities}),({knots}),.UNSPECIFIED."})
+
+    theta=np.linspace(0,np.pi/2,n_ctrl)
+    radius=1000/(np.pi/2)+wiggle*(-1)**np.arange(n_ctrl)
+    curve.ctrl_pts=np.stack([radius*np.cos(theta),radius*np.sin(theta),np.zeros(n_ctrl)],axis=1)
+    curve.bspline=BSpline(curve.knot_vector,curve.ctrl_pts,degree)
+
+    return curve
+
+class Counting_spline():
+    """Wraps a scipy BSpline, counting the parameter values it (or its derivative) is evaluated at."""
+    def __init__(self,bspline,count:list=None):
+        self.bspline=bspline
+        self.count=count if count is not None else [0]
+
+    def __call__(self,t):
+        self.count[0]+=np.size(t)
+        return self.bspline(t)
+
+    def derivative(self):
+        return Counting_spline(self.bspline.derivative(),self.count)
+
+def Chord_parameters(curve,spacing:float)->np.ndarray:
+    """Node parameters from the previous arc-length estimate, chords through 30 samples per control point."""
+    u=np.linspace(curve.knot_vector[0],curve.knot_vector[-1],int(curve.ctrl_pts.shape[0]*30))
+    points=curve.bspline(u)
+    length_list=np.concatenate(([0.],np.cumsum(np.linalg.norm(np.diff(points,axis=0),axis=1))))
+    N=int(round(length_list[-1]/spacing,0))
+
+    dL=np.arange(N)*(length_list[-1]/N)
+    j=np.clip(np.searchsorted(length_list,dL,side='right')-1,0,len(u)-2)
+    ratio=(dL-length_list[j])/(length_list[j+1]-length_list[j])
+
+    return np.append(u[j]+ratio*(u[j+1]-u[j]),u[-1])
+
+def bench_bspline_arclength(n_ctrl:int=200)->None:
+    """Curve evaluations and node spacing error, chord-length estimate vs the quadrature arc-length table."""
+    print(f"{'curve':>8} {'spacing':>8} {'method':>10} {'evaluations':>12} {'spacing error':>14} {'time [s]':>9}")
+    for name,wiggle in (('gentle',0.5),('tight',8.)):
+        curve=Synthetic_bspline(n_ctrl,wiggle)
+        exact=Synthetic_bspline(n_ctrl,wiggle)
+        exact.arc_length_table(1e-13*1000)
+
+        for spacing in (1.,10.):
+            rows=[]
+            bspline=curve.bspline
+
+            curve.bspline=Counting_spline(bspline)
+            t0=perf_counter()
+            t=Chord_parameters(curve,spacing)
+            rows.append(('chords',curve.bspline.count[0],t,perf_counter()-t0))
+
+            curve.bspline=Counting_spline(bspline)
+            curve.arc_table=None
+            t0=perf_counter()
+            tol=curve.NODE_TOL
+            breaks,lengths,_=curve.arc_length_table(tol*spacing/2)
+            N=max(int(round(lengths[-1]/spacing,0)),1)
+            t=np.concatenate(([breaks[0]],curve.parameters(np.arange(1,N)*lengths[-1]/N,tol*lengths[-1]/N),[breaks[-1]]))
+            rows.append(('quadrature',curve.bspline.count[0],t,perf_counter()-t0))
+            curve.bspline=bspline
+
+            for method,count,t,time in rows:
+                s=exact.arc_length(t)
+                spacing_=s[-1]/(len(s)-1)
+                error=np.abs(s-np.arange(len(s))*spacing_).max()/spacing_
+                print(f"{name:>8} {spacing:>8} {method:>10} {count:>12} {error:>14.2e} {time:>9.4f}")
+
+    return None
+
+def bench_adaptive_boundary(n_points:int=61)->None:
+    """Boundary and interior element counts, curvature-adaptive vs uniform spacing at equal chord deviation."""
+    spacing=2.
+    with tempfile.TemporaryDirectory() as tmp:
+        file=os.path.join(tmp,'naca0012.stp')
+        Write_naca_step(file,n_points=n_points)
+        loops=[('naca0012',obj) for obj in Data_sort(Step_read(file)).values() if type(obj).__name__=='Edge_loop']
+    here=os.path.dirname(os.path.abspath(__file__))
+    loops+=[(f"shape #{obj.id}",obj) for obj in Data_sort(Step_read(os.path.join(here,'shape.stp'))).values() if type(obj).__name__=='Edge_loop']
+
+    print(f"spacing {spacing}, growth 1.2")
+    print(f"{'loop':>10} {'deviation':>10} {'uniform h':>10} {'boundary':>9} {'uniform':>8} {'interior':>9} {'uniform':>8} {'time [s]':>9}")
+    for name,loop in loops:
+        for deviation in (0.01,0.001):
+            t0=perf_counter()
+            loop.gen_nodes(spacing,deviation)
+            t1=perf_counter()
+            r=loop.adaptive_report(spacing,deviation)
+            print(
+                f"{name:>10} {deviation:>10} {r['uniform_spacing']:>10.4f} {r['boundary_nodes']:>9} {r['uniform_boundary_nodes']:>8}"
+                f" {r['interior_elements']:>9} {r['uniform_interior_elements']:>8} {t1-t0:>9.4f}"
+            )
+
+    return None
+
+def Loop_nodes(n_nodes:int,n_edges:int=1000,noise:float=1e-10)->np.ndarray:
+    """Boundary nodes of a polygon loop as gen_nodes produces them, edge end nodes repeated with floating point noise."""
+    theta=np.linspace(0,2*np.pi,n_nodes,endpoint=False)
+    nodes=np.stack([100*np.cos(theta),100*np.sin(theta),np.zeros(n_nodes)],axis=1)
+
+    #   each edge ends on the next edge's first node
+    edges=np.array_split(np.arange(n_nodes),n_edges)
+    ends=[nodes[e[0]]+noise*np.random.default_rng(i).standard_normal(3)*[1,1,0] for i,e in enumerate(edges[1:]+edges[:1])]
+    blocks=[np.concatenate([nodes[e],[end]]) for e,end in zip(edges,ends)]
+
+    return np.concatenate(blocks)
+
+def List_dedup(nodes:np.ndarray)->np.ndarray:
+    """The previous Remove_duplicate_nodes, exact matches only, O(n^2)."""
+    nodes_=[]
+    for node in nodes:
+        if (list(node) in nodes_)==False:
+            nodes_.append(list(node))
+
+    return np.array(nodes_)
+
+def bench_dedup(max_nodes:int=10**6)->None:
+    """Node de-duplication time, previous list scan vs the Unique_nodes hash grid."""
+    print(f"{'nodes':>9} {'list scan [s]':>14} {'unique':>8} {'hash grid [s]':>14} {'unique':>8}")
+    n=10**3
+    while n<=max_nodes:
+        nodes=Loop_nodes(n,n_edges=max(n//100,1))
+
+        if n<=10**4:
+            t0=perf_counter()
+            scan=len(List_dedup(nodes))
+            scan_time=f"{perf_counter()-t0:>14.4f}"
+        else:
+            scan,scan_time="-",f"{'-':>14}"
+
+        t0=perf_counter()
+        unique,inverse=Unique_nodes(nodes)
+        grid_time=perf_counter()-t0
+        assert np.abs(unique[inverse]-nodes).max()<=1e-9*200
+
+        print(f"{len(nodes):>9} {scan_time} {scan:>8} {grid_time:>14.4f} {len(unique):>8}")
+        n*=10
+
+    return None
+
+def Scan_chain(edges:list)->list:
+    """The previous Edge_loop edge ordering, a scan of the remaining edges for every edge, O(E^2)."""
+    def find_next_edge(current_edge,edges):
+        end=current_edge.edge_curve.end_coords
+
+        for edge in edges:
+            start=edge.edge_curve.start_coords
+            if list(start)==list(end):
+                return edge
+
+    reordered=[edges[0]]
+    unordered=edges[1:]
+    for i in range(len(edges)-1):
+        next_edge=find_next_edge(reordered[i],unordered)
+        reordered.append(next_edge)
+        unordered.remove(next_edge)
+
+    return reordered
+
+def bench_edge_chain(max_edges:int=10**5)->None:
+    """Edge loop chaining time, previous scan vs the endpoint hash in Edge_loop.ordered_edges."""
+    print(f"{'edges':>8} {'scan [s]':>10} {'hash [s]':>10}")
+    n=100
+    while n<=max_edges:
+        with tempfile.TemporaryDirectory() as tmp:
+            file=os.path.join(tmp,'loop.stp')
+            Write_synthetic_step(file,n_edges=n)
+            loop=Data_sort(Step_read(file))[4]
+
+        #   edges listed in reverse, so the chain has to be found
+        loop.edges=loop.edges[:1]+loop.edges[1:][::-1]
+
+        scan_time=f"{'-':>10}"
+        if n<=1000:     #   10^4 edges takes minutes
+            t0=perf_counter()
+            scan=Scan_chain(loop.edges)
+            scan_time=f"{perf_counter()-t0:>10.4f}"
+
+        loop.ordered=None
+        t0=perf_counter()
+        chain=loop.ordered_edges()
+        t1=perf_counter()
+        if n<=1000:
+            assert [e.id for e in scan]==[e.id for e in chain]
+
+        print(f"{n:>8} {scan_time} {t1-t0:>10.4f}")
+        n*=10
+
+    return None
+
+def bench_shared_edges(n:int=20)->None:
+    """Boundary discretisation of n x n faces sharing edges, one cache per loop vs one Discretisation_cache per run."""
+    from geometry import Discretisation_cache
+
+    spacing=0.1
+    with tempfile.TemporaryDirectory() as tmp:
+        file=os.path.join(tmp,'grid.stp')
+        Write_grid_step(file,n)
+        loops=[obj for obj in Data_sort(Step_read(file)).values() if type(obj).__name__=='Edge_loop']
+
+    print(f"{n*n} faces, spacing {spacing}")
+    print(f"{'':>12} {'time [s]':>9} {'edges discretised':>18} {'boundary nodes':>15} {'distinct coords':>16}")
+    for name,shared in (('per loop',False),('shared',True)):
+        cache=Discretisation_cache()
+        t0=perf_counter()
+        if shared:
+            ids=[loop.node_ids(spacing,cache=cache) for loop in loops]
+            nodes=[cache.nodes[x] for x in ids]
+            edges=len(cache.edges)
+        else:
+            nodes=[loop.gen_nodes(spacing) for loop in loops]
+            edges=sum(len(loop.edges) for loop in loops)
+        t1=perf_counter()
+
+        nodes=np.concatenate([x[:-1] for x in nodes])
+        print(f"{name:>12} {t1-t0:>9.4f} {edges:>18} {len(nodes):>15} {len(np.unique(nodes,axis=0)):>16}")
+
+    return None
+
+def Strip_front(n_sides:int,width:int=3,spacing:float=1.):
+    """
+    Front of about n_sides boundary sides around a long strip width sides wide, so the number of panels
+    grows linearly with the boundary. The loop runs clockwise, filling the strip from the inside.
+    """
+    from mesh import Front, Front_side
+
+    m=n_sides//2-width
+    points=np.array(
+        [(i,0.,0.) for i in range(m)]+[(m,j,0.) for j in range(width)]+
+        [(m-i,width,0.) for i in range(m)]+[(0.,width-j,0.) for j in range(width)]
+    )[::-1]*spacing
+    vect_out_plane=np.array([0.,0.,1.])
+    sides=[Front_side(points[i],points[(i+1)%len(points)],False,vect_out_plane) for i in range(len(points))]
+
+    return Front(sides)
+
+def Plate_front(size:float,holes:int,radius:float,spacing:float):
+    """
+    Front of a square plate size wide with a holes x holes grid of circular holes, sides about spacing
+    long. The outer loop runs anticlockwise and the holes clockwise, filling the plate from the left.
+    """
+    from mesh import Front, Front_side
+
+    n=int(round(size/spacing))
+    t=np.arange(n)*size/n
+    loops=[np.concatenate([np.stack([t,0*t],1),np.stack([size+0*t,t],1),np.stack([size-t,size+0*t],1),np.stack([0*t,size-t],1)])]
+    m=max(3,int(round(2*np.pi*radius/spacing)))
+    angles=-2*np.pi*np.arange(m)/m
+    for i in range(holes):
+        for j in range(holes):
+            centre=(np.array([i,j])+0.5)*size/holes
+            loops.append(centre+radius*np.stack([np.cos(angles),np.sin(angles)],1))
+    vect_out_plane=np.array([0.,0.,1.])
+    sides=[]
+    for loop in loops:
+        points=np.concatenate([loop,np.zeros([len(loop),1])],axis=1)
+        sides.extend(Front_side(points[i],points[(i+1)%len(points)],True,vect_out_plane) for i in range(len(points)))
+
+    return Front(sides)
+
+def bench_front_queries(max_sides:int=10**5)->None:
+    """
+    Near-node queries over a whole run, one per front side plus the grid update of a side leaving and
+    re-entering the front, with Front.nodes_near vs a full scan of the node table.
+    The scan is only run up to 10^4 sides.
+    """
+    from mesh import Mesh
+
+    spacing=1.
+    dy=np.sqrt(spacing**2-(spacing/2)**2)
+    Mesh.find_near_nodes(np.zeros(3),np.zeros([1,3]),1.)    #   compile
+
+    print(f"{'sides':>8} {'scan [s]':>10} {'grid [s]':>10} {'grid/side [us]':>15}")
+    n=10**3
+    while n<=max_sides:
+        front=Strip_front(n,spacing=spacing)
+        sides=front.sides
+        centres=[side.A+side.x*side.length/2+side.y*dy for side in sides]
+
+        scan_time=f"{'-':>10}"
+        if n<=10**4:
+            t0=perf_counter()
+            nodes=front.points[:front.n_points]
+            scan=[len(Mesh.find_near_nodes(C,nodes,spacing)) for C in centres]
+            scan_time=f"{perf_counter()-t0:>10.3f}"
+
+        t0=perf_counter()
+        grid=[]
+        for side,C in zip(sides,centres):
+            grid.append(len(Mesh.find_near_nodes(C,front.points[front.nodes_near(C,spacing)],spacing)))
+            front.grid.remove(side.slot,side.A,side.B)
+            front.grid.add(side.slot,side.A,side.B)
+        t1=perf_counter()
+        if n<=10**4:
+            assert scan==grid
+
+        print(f"{len(sides):>8} {scan_time} {t1-t0:>10.3f} {1e6*(t1-t0)/len(sides):>15.1f}")
+        n*=10
+
+    return None
+
+def bench_front_scaling(max_sides:int=10**5)->None:
+    """Whole advancing front runs on strip fronts of 10^3 to max_sides sides, whose panel count grows linearly with the boundary."""
+    from mesh import Mesh
+
+    cwd=os.getcwd()
+    print(f"{'sides':>8} {'panels':>8} {'time [s]':>10} {'per panel [us]':>15}")
+    n=10**3
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)   #   Mesh writes profile.txt
+        try:
+            while n<=max_sides:
+                front=Strip_front(n)
+                t0=perf_counter()
+                mesh=Mesh(spacing=1.,front=front)
+                t1=perf_counter()
+                print(f"{n:>8} {len(mesh.triangles):>8} {t1-t0:>10.3f} {1e6*(t1-t0)/len(mesh.triangles):>15.1f}")
+                n*=10
+        finally:
+            os.chdir(cwd)
+
+    return None
+
+def Scan_sides_at(front,node:int)->list:
+    """Front.sides_at as a scan of every side row, as before the node -> side map."""
+    side_nodes=front.side_nodes[:front.n_slots]
+    slots=np.flatnonzero(front.alive[:front.n_slots]&((side_nodes[:,0]==node)|(side_nodes[:,1]==node)))
+
+    return slots[np.argsort(front.seq[slots],kind='stable')].tolist()
+
+def bench_side_lookup(n_points:int=61)->None:
+    """
+    Per-iteration cost of meshing the synthetic NACA0012 section, with the sides at a node found by
+    scanning the side rows vs from Front.incident.
+    """
+    from mesh import Mesh, Front, read, init_front, warmup
+
+    warmup()
+    cwd=os.getcwd()
+    print(f"{'spacing':>8} {'sides':>6} {'panels':>7} {'lookup':>7} {'per iteration [us]':>19} {'in sides_at [us]':>17}")
+    with tempfile.TemporaryDirectory() as tmp:
+        file=os.path.join(tmp,'naca.stp')
+        Write_naca_step(file,n_points=n_points)
+        faces=read(file)
+        os.chdir(tmp)   #   Mesh writes profile.txt
+        original=Front.sides_at
+        try:
+            for spacing in (2.,1.,0.5):
+                for name,lookup in (('scan',Scan_sides_at),('map',original)):
+                    spent=[0.]
+                    def sides_at(front,node):
+                        t0=perf_counter()
+                        slots=lookup(front,node)
+                        spent[0]+=perf_counter()-t0
+                        return slots
+                    Front.sides_at=sides_at
+                    front=init_front(faces,spacing=spacing,orientation_flip=True)
+                    n_sides=len(front)
+                    t0=perf_counter()
+                    mesh=Mesh(spacing=spacing,front=front)
+                    t1=perf_counter()
+                    n=len(mesh.triangles)
+                    print(f"{spacing:>8} {n_sides:>6} {n:>7} {name:>7} {1e6*(t1-t0)/n:>19.1f} {1e6*spent[0]/n:>17.1f}")
+        finally:
+            Front.sides_at=original
+            os.chdir(cwd)
+
+    return None
+
+def Scan_edges_cross(front,a:int,b:int,nodes:np.ndarray)->np.ndarray:
+    """Front.edges_cross against every live side, the O(n) check without the segment grid, for fronts on the xy plane."""
+    slots=np.flatnonzero(front.alive[:front.n_slots])
+    ends=front.side_nodes[slots]
+    U,V=front.points[ends[:,0]][None],front.points[ends[:,1]][None]
+    crosses=np.zeros(len(nodes),dtype=bool)
+    for start in (a,b):
+        P=front.points[start][None,None]
+        Q=front.points[nodes][:,None]
+        d,e=Q-P,V-U
+        o_U=d[...,0]*(U[...,1]-P[...,1])-d[...,1]*(U[...,0]-P[...,0])
+        o_V=d[...,0]*(V[...,1]-P[...,1])-d[...,1]*(V[...,0]-P[...,0])
+        o_P=e[...,0]*(P[...,1]-U[...,1])-e[...,1]*(P[...,0]-U[...,0])
+        o_Q=e[...,0]*(Q[...,1]-U[...,1])-e[...,1]*(Q[...,0]-U[...,0])
+        touching=((ends[:,0]==start)|(ends[:,1]==start))[None]|(ends[None,:,0]==nodes[:,None])|(ends[None,:,1]==nodes[:,None])
+        crosses|=np.any((o_U*o_V<0)&(o_P*o_Q<0)&~touching,axis=1)
+
+    return crosses
+
+def bench_crossings(max_sides:int=10**5,n_queries:int=1000)->None:
+    """
+    Front crossing check of the edges A-C and B-C to the nodes within 2*spacing of the ideal node of
+    n_queries sides on strip fronts, with the segment grid (Front.edges_cross) vs a scan of every side.
+    """
+    from mesh import plane_axes
+
+    spacing=1.
+    dy=np.sqrt(spacing**2-(spacing/2)**2)
+    axes=plane_axes(np.array([0.,0.,1.]))
+    print(f"{'sides':>8} {'queries':>8} {'crossing':>9} {'grid [us]':>10} {'scan [us]':>10} {'agree':>6}")
+    n=10**3
+    while n<=max_sides:
+        front=Strip_front(n)
+        slots=np.flatnonzero(front.alive[:front.n_slots])[::max(1,n//n_queries)]
+        queries=[]
+        for slot in slots:
+            side=front.side(slot)
+            a,b=side.ids
+            nodes=front.nodes_near(side.A+side.x*side.length/2+side.y*dy,2*spacing)
+            nodes=nodes[(nodes!=a)&(nodes!=b)]
+            if len(nodes):
+                queries.append((a,b,nodes))
+        front.edges_cross(0,1,np.zeros(0,dtype=np.int64),spacing,axes)   #   build the grid
+
+        results=[]
+        times=[]
+        for check in (lambda a,b,nodes:front.edges_cross(a,b,nodes,spacing,axes),lambda a,b,nodes:Scan_edges_cross(front,a,b,nodes)):
+            t0=perf_counter()
+            results.append([check(a,b,nodes) for a,b,nodes in queries])
+            times.append(perf_counter()-t0)
+        agree=all(np.array_equal(x,y) for x,y in zip(*results))
+        n_crossing=sum(int(x.sum()) for x in results[0])
+        print(f"{n:>8} {len(queries):>8} {n_crossing:>9} {1e6*times[0]/len(queries):>10.1f} {1e6*times[1]/len(queries):>10.1f} {str(agree):>6}")
+        n*=10
+
+    return None
+
+def Loop_filter_near_nodes(front,current_side,nodes:np.ndarray,distances:np.ndarray)->tuple:
+    """Mesh.filter_near_nodes one candidate at a time with arccos angles, as before the batched version."""
+    def check_side_direction(side,node):
+        d_side_in=(side.A[0]+1*side.y[0]-side.A[0])*(side.B[1]-side.A[1])-(side.A[1]+1*side.y[1]-side.A[1])*(side.B[0]-side.A[0])
+        d_node=(node[0]-side.A[0])*(side.B[1]-side.A[1])-(node[1]-side.A[1])*(side.B[0]-side.A[0])
+        return d_node,d_side_in
+
+    a,b=current_side.ids
+    slots=dict.fromkeys(front.sides_at(a)+front.sides_at(b))
+    L_angle,R_angle=0,0
+    L_constraint,R_constraint=(None,1.),(None,1.)
+    for slot in [slot for slot in slots if slot!=current_side.slot]:
+        adj_side=front.side(slot)
+        connect_A=adj_side.ids[0]==a or (adj_side.ids[0]!=b and adj_side.ids[1]==a)
+        d_node,d_in=check_side_direction(current_side,adj_side.A if connect_A else adj_side.B)
+        if d_node*d_in>0:
+            cos=np.dot(adj_side.vector,current_side.vector)/(adj_side.length*current_side.length)
+            angle=np.rad2deg(np.arccos(cos))
+            if connect_A and angle>L_angle:
+                L_angle,L_constraint=angle,(slot,cos)
+            elif not connect_A and angle>R_angle:
+                R_angle,R_constraint=angle,(slot,cos)
+
+    survivors=[]
+    for i,node in enumerate(nodes):
+        node2A=current_side.A-node
+        B2node=node-current_side.B
+        node2A_mod=np.linalg.norm(node2A)
+        B2node_mod=np.linalg.norm(B2node)
+        angle_A=np.rad2deg(np.arccos(np.dot(node2A,current_side.vector)/(node2A_mod*current_side.length))) if node2A_mod!=0 else 180
+        angle_B=np.rad2deg(np.arccos(np.dot(B2node,current_side.vector)/(B2node_mod*current_side.length))) if B2node_mod!=0 else 180
+        if angle_A>=L_angle and angle_B>=R_angle:
+            d_node,d_in=check_side_direction(current_side,node)
+            if d_node*d_in>0:
+                survivors.append(i)
+    survivors=np.array(survivors,dtype=np.int64)
+
+    return survivors,distances[survivors],(L_constraint,R_constraint)
+
+def bench_filter(n_points:int=61)->None:
+    """
+    Time in Mesh.filter_near_nodes per iteration while meshing square_loop.stp and the synthetic NACA0012
+    section, per-candidate loop vs batched cosine predicates.
+    """
+    from mesh import Mesh, read, init_front, warmup
+
+    warmup()
+    here=os.path.dirname(os.path.abspath(__file__))
+    cwd=os.getcwd()
+    print(f"{'case':>22} {'panels':>7} {'filter':>8} {'candidates/call':>16} {'per call [us]':>14} {'per iteration [us]':>19}")
+    with tempfile.TemporaryDirectory() as tmp:
+        naca=os.path.join(tmp,'naca0012.stp')
+        Write_naca_step(naca,n_points=n_points)
+        os.chdir(tmp)   #   Mesh writes profile.txt
+        original=Mesh.__dict__['filter_near_nodes']
+        try:
+            for file,spacing in ((os.path.join(here,'square_loop.stp'),1.),(naca,1.),(naca,0.5)):
+                faces=read(file)
+                for name,method in (('loop',Loop_filter_near_nodes),('batched',original.__func__)):
+                    spent=[0.,0,0]
+                    def filter_near_nodes(front,current_side,nodes,distances):
+                        t0=perf_counter()
+                        result=method(front,current_side,nodes,distances)
+                        spent[0]+=perf_counter()-t0
+                        spent[1]+=1
+                        spent[2]+=len(nodes)
+                        return result
+                    Mesh.filter_near_nodes=staticmethod(filter_near_nodes)
+                    front=init_front(faces,spacing=spacing,orientation_flip=True)
+                    t0=perf_counter()
+                    mesh=Mesh(spacing=spacing,front=front)
+                    t1=perf_counter()
+                    n=len(mesh.triangles)
+                    case=f"{os.path.basename(file)} s={spacing}"
+                    print(f"{case:>22} {n:>7} {name:>8} {spent[2]/spent[1]:>16.1f} {1e6*spent[0]/spent[1]:>14.1f} {1e6*(t1-t0)/n:>19.1f}")
+        finally:
+            Mesh.filter_near_nodes=original
+            os.chdir(cwd)
+
+    return None
+
+SELECTION_PROBE="""
+import sys
+from time import perf_counter
+import numpy as np
+import mesh
+file,select,spacing=sys.argv[1],sys.argv[2],float(sys.argv[3])
+mesh.warmup()
+front=mesh.init_front(mesh.read(file),spacing=spacing,orientation_flip=True)
+t0=perf_counter()
+m=mesh.Mesh(spacing=spacing,front=front,select=select)
+t1=perf_counter()
+P=m.nodes[m.triangles]
+E=np.roll(P,-1,axis=1)-P
+E/=np.linalg.norm(E,axis=2,keepdims=True)
+angles=np.degrees(np.arccos(np.clip(-np.sum(E*np.roll(E,1,axis=1),axis=2),-1,1)))
+print(len(P),t1-t0,angles.min())
+"""
+
+def bench_selection(timeout:int=120)->None:
+    """
+    Side selection strategies on the bundled STEP files and the synthetic NACA0012 section: iterations
+    (one panel each), wall time and smallest panel angle. Runs longer than timeout seconds are stopped.
+    """
+    here=os.path.dirname(os.path.abspath(__file__))
+
+    print(f"{'file':>16} {'select':>9} {'iterations':>11} {'time [s]':>9} {'min angle':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        Write_naca_step(os.path.join(tmp,'naca0012.stp'))
+        files=[os.path.join(here,x) for x in ('circle.stp','square_loop.stp','shape.stp')]+[os.path.join(tmp,'naca0012.stp')]
+        env=dict(os.environ,PYTHONPATH=here)
+        for file in files:
+            for select in ('oldest','shortest','layer'):
+                try:
+                    out=subprocess.run([sys.executable,"-c",SELECTION_PROBE,file,select,"2"],cwd=tmp,env=env,
+                        capture_output=True,text=True,check=True,timeout=timeout)
+                    n,t,angle=out.stdout.split()[-3:]
+                    print(f"{os.path.basename(file):>16} {select:>9} {int(n):>11} {float(t):>9.2f} {float(angle):>10.2f}")
+                except subprocess.TimeoutExpired:
+                    print(f"{os.path.basename(file):>16} {select:>9} {'-':>11} {f'>{timeout}':>9} {'-':>10}")
+
+    return None
+
+def bench_engines(max_sides:int=10**4)->None:
+    """
+    Python vs compiled (numba) advancing front on square_loop.stp, the synthetic NACA0012 section and strip
+    fronts up to max_sides. Also checks the panels are identical.
+    """
+    from mesh import Mesh, read, init_front, warmup
+
+    warmup()
+    here=os.path.dirname(os.path.abspath(__file__))
+    cwd=os.getcwd()
+    print(f"{'case':>22} {'panels':>8} {'python [s]':>11} {'numba [s]':>10} {'speed-up':>9} {'identical':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        naca=os.path.join(tmp,'naca0012.stp')
+        Write_naca_step(naca)
+        cases=[(f"{os.path.basename(file)} s={spacing}",lambda file=file,spacing=spacing:init_front(read(file),spacing=spacing,orientation_flip=True),spacing)
+            for file in (os.path.join(here,'square_loop.stp'),naca) for spacing in (2,1)]
+        n=10**3
+        while n<=max_sides:
+            cases.append((f"strip {n}",lambda n=n:Strip_front(n),1.))
+            n*=10
+
+        os.chdir(tmp)   #   Mesh writes profile.txt
+        try:
+            for name,make_front,spacing in cases:
+                times=[]
+                points=[]
+                for engine in ('python','numba'):
+                    front=make_front()
+                    t0=perf_counter()
+                    mesh=Mesh(spacing=spacing,front=front,engine=engine)
+                    times.append(perf_counter()-t0)
+                    points.append(mesh.nodes[mesh.triangles])
+                identical=points[0].shape==points[1].shape and np.array_equal(*points)
+                print(f"{name:>22} {len(points[0]):>8} {times[0]:>11.3f} {times[1]:>10.3f} {times[0]/times[1]:>9.1f} {str(identical):>10}")
+        finally:
+            os.chdir(cwd)
+
+    return None
+
+def bench_mesh_memory(max_sides:int=10**4)->None:
+    """
+    Memory held by strip meshes as Panel objects with their corner loops, as advancing_front used to
+    return them, vs the node and connectivity arrays it returns now.
+    """
+    from mesh import Mesh, warmup
+
+    warmup()
+    cwd=os.getcwd()
+    print(f"{'sides':>8} {'panels':>8} {'Panel objects [MB]':>19} {'arrays [MB]':>12} {'ratio':>6}")
+    n=10**3
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)   #   Mesh writes profile.txt
+        try:
+            while n<=max_sides:
+                mesh=Mesh(spacing=1.,front=Strip_front(n),engine='numba')
+                tracemalloc.start()
+                panels=mesh.panels
+                loops=[panel.points for panel in panels]
+                object_bytes=tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                del panels,loops
+                array_bytes=sum(x.nbytes for x in (mesh.nodes,mesh.triangles,mesh.planes,mesh.normals))
+                print(f"{n:>8} {len(mesh.triangles):>8} {object_bytes/1e6:>19.2f} {array_bytes/1e6:>12.2f} {object_bytes/array_bytes:>6.1f}")
+                n*=10
+        finally:
+            os.chdir(cwd)
+
+    return None
+
+def bench_domains(max_domains:int=8,n_sides:int=500)->None:
+    """
+    Domain decomposition (Mesh domains=) of a 100 x 100 plate with 16 holes and n_sides boundary sides
+    along each edge, compiled engine, against the serial run: wall time, speed-up and the defects of
+    Mesh_defects, which should be 0.
+    """
+    from mesh import Mesh, warmup
+
+    warmup()
+    spacing=100/n_sides
+    cwd=os.getcwd()
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'domains':>8} {'panels':>9} {'time [s]':>9} {'speed-up':>9} {'defects':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)   #   Mesh writes profile.txt
+        try:
+            domains=1
+            while domains<=max_domains:
+                front=Plate_front(100.,4,6.,spacing)
+                boundary=front.side_nodes[np.flatnonzero(front.alive[:front.n_slots])]
+                t0=perf_counter()
+                mesh=Mesh(spacing=spacing,front=front,engine='numba',domains=domains)
+                t=perf_counter()-t0
+                if domains==1:
+                    serial=t
+                defects=Mesh_defects(mesh.nodes,mesh.triangles,boundary)
+                print(f"{domains:>8} {len(mesh.triangles):>9} {t:>9.2f} {serial/t:>9.1f} {defects:>8}")
+                domains*=2
+        finally:
+            os.chdir(cwd)
+
+    return None
+
+def bench_faces(max_n:int=8,n_sides:int=50)->None:
+    """
+    Per face meshing (init_front(per_face=True)) of Write_grid_step files with n x n faces and n_sides
+    boundary sides along each face edge, compiled engine, in one worker and in one per CPU, with the
+    defects of Mesh_defects. One global front does not mesh these: the faces' shared edges give it
+    coincident sides running opposite ways.
+    """
+    from mesh import Mesh, read, init_front, warmup
+
+    warmup()
+    spacing=10/n_sides
+    cwd=os.getcwd()
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'faces':>6} {'panels':>9} {'1 worker [s]':>13} {'per CPU [s]':>12} {'defects':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)   #   Mesh writes profile.txt
+        try:
+            n=2
+            while n<=max_n:
+                Write_grid_step('grid.stp',n)
+                faces=read('grid.stp')
+                times=[]
+                for workers in (1,None):
+                    fronts=init_front(faces,spacing=spacing,orientation_flip=True,per_face=True)
+                    boundary=np.concatenate([x.side_nodes[np.flatnonzero(x.alive[:x.n_slots])] for x in fronts])
+                    t0=perf_counter()
+                    mesh=Mesh(spacing=spacing,front=fronts,engine='numba',workers=workers)
+                    times.append(perf_counter()-t0)
+                defects=Mesh_defects(mesh.nodes,mesh.triangles,boundary)
+                print(f"{n*n:>6} {len(mesh.triangles):>9} {times[0]:>13.2f} {times[1]:>12.2f} {defects:>8}")
+                n*=2
+        finally:
+            os.chdir(cwd)
+
+    return None
+
+BENCHMARKS={
+    'step_read':bench_step_read,
+    'step_mmap':bench_step_mmap,
+    'prune':bench_prune,
+    'data_sort':bench_data_sort,
+    'geom_cache':bench_geom_cache,
+    'point_store':bench_point_store,
+    'entity_memory':bench_entity_memory,
+    'parallel_decode':bench_parallel_decode,
+    'startup':bench_startup,
+    'curve_nodes':bench_curve_nodes,
+    'bspline_arclength':bench_bspline_arclength,
+    'adaptive_boundary':bench_adaptive_boundary,
+    'dedup':bench_dedup,
+    'edge_chain':bench_edge_chain,
+    'shared_edges':bench_shared_edges,
+    'front_queries':bench_front_queries,
+    'front_scaling':bench_front_scaling,
+    'side_lookup':bench_side_lookup,
+    'filter':bench_filter,
+    'crossings':bench_crossings,
+    'selection':bench_selection,
+    'engines':bench_engines,
+    'mesh_memory':bench_mesh_memory,
+    'domains':bench_domains,
+    'faces':bench_faces,
+}
+
+if __name__=="__main__":
+    if len(sys.argv)<2 or sys.argv[1] not in BENCHMARKS:
+        print(__doc__)
+        print("Benchmarks:",", ".join(BENCHMARKS))
+        sys.exit(1)
+
+    BENCHMARKS[sys.argv[1]](*[int(float(x)) for x in sys.argv[2:]])
@@ -0,0 +1,2 @@
+#   advancing_front_test.py is a manual debug script (plots, clears the console), not a test module.
+collect_ignore=["advancing_front_test.py"]
@@ -1,8 +1,6 @@
 import numpy as np
-from matplotlib import pyplot as plt
 
 from mesh import Mesh,Front,Front_side
-from plot_tools import Plot_nodes_2d,Plot_panels, Plot_sides
 
 vect_out_plane=np.array([0,0,1])
 
@@ -12,45 +10,62 @@ p2=np.array([0,0,0])
 p3=np.array([0.5,0,0])
 p4=np.array([0.5,0.5,0])
 
-#px1=np.array([1,1,0])
-#px2=np.array([-2,2,0])
-
-P1=np.array([0.25,-0.05,0])
+P1=np.array([0.25,-0.05,0])     #   below the current side
+P2=np.array([-0.1,0.3,0])       #   outside the left constraint
+P3=np.array([0.6,0.3,0])        #   outside the right constraint
+P4=np.array([0.25,0.3,0])       #   inside both
 
 spacing=0.5
 
-#   mesh setup
-sides=[
-    Front_side(p1,p2,orientation=False,vect_out_plane=vect_out_plane),
-    Front_side(p2,p3,orientation=False,vect_out_plane=vect_out_plane),
-    Front_side(p3,p4,orientation=False,vect_out_plane=vect_out_plane)
-    #Front_side(px1,p2,orientation=False,vect_out_plane=vect_out_plane),
-    #Front_side(p3,px2,orientation=False,vect_out_plane=vect_out_plane)
-]
+def Corner_front(points:list)->Front:
+    """Open front along points, the current side is the second."""
+    return Front([Front_side(points[i],points[i+1],orientation=True,vect_out_plane=vect_out_plane) for i in range(len(points)-1)])
+
+def Filter(front:Front,current_side:Front_side,extra:list)->tuple:
+    """Nodes near the ideal node of current_side, other than A and B, put through Mesh.filter_near_nodes."""
+    dy=np.sqrt(spacing**2-(spacing/2)**2)
+    c_ideal=current_side.A+current_side.x*current_side.length/2+current_side.y*dy
+
+    nodes=np.concatenate([front.nodes,np.array(extra).reshape(-1,3)])
+    index,distances=Mesh.find_near_nodes(c_ideal,nodes,r=spacing)
+    keep=[i for i in range(len(index)) if not (np.array_equal(nodes[index[i]],current_side.A) or np.array_equal(nodes[index[i]],current_side.B))]
+    nodes,distances=nodes[index[keep]],distances[keep]
+
+    survivors,survivor_distances,constraints=Mesh.filter_near_nodes(front,current_side,nodes,distances)
 
-#   test
-front=Front(sides)
+    return nodes,survivors,survivor_distances,constraints
 
-mesh=Mesh(front=front,spacing=spacing)
+def test_filter_between_adjacent_sides():
+    front=Corner_front([p1,p2,p3,p4])
+    current_side=front.side(1)
+    nodes,survivors,distances,(L_constraint,R_constraint)=Filter(front,current_side,[P1,P2,P3,P4])
 
+    #   both adjacent sides stand at 90 degrees, their far nodes lie on the constraints and are kept
+    assert L_constraint==(0,0.)
+    assert R_constraint==(2,0.)
+    assert sorted(map(tuple,nodes[survivors].tolist()))==sorted(map(tuple,[p1.tolist(),P4.tolist(),p4.tolist()]))
+    assert np.allclose(distances,np.linalg.norm(nodes[survivors]-np.array([0.25,np.sqrt(0.1875),0]),axis=1))
 
-current_side=sides[1]
-x=current_side.x
-y=current_side.y
-dx=current_side.length
-dy=np.sqrt(spacing**2-(spacing/2)**2)
+def test_filter_without_adjacent_sides():
+    front=Front([Front_side(p2,p3,orientation=True,vect_out_plane=vect_out_plane)])
+    current_side=front.side(0)
+    nodes,survivors,_,(L_constraint,R_constraint)=Filter(front,current_side,[P1,P2,P3,P4])
 
-A=current_side.A
-B=current_side.B
-c_ideal=A+x*dx/2+y*dy
+    #   unconstrained: every node above the side survives
+    assert L_constraint==(None,1.)
+    assert R_constraint==(None,1.)
+    assert sorted(map(tuple,nodes[survivors].tolist()))==sorted(map(tuple,[P2.tolist(),P3.tolist(),P4.tolist()]))
 
-nodes=np.append(front.nodes,np.array([P1]),axis=0)
-near_nodes=mesh.find_near_nodes(c_ideal,nodes,r=spacing,exclude=(A,B))
+if __name__=="__main__":
+    from matplotlib import pyplot as plt
+    from plot_tools import Plot_nodes_2d,Plot_sides
 
-print(mesh.filter_near_nodes(current_side,near_nodes))
+    front=Corner_front([p1,p2,p3,p4])
+    nodes,survivors,distances,constraints=Filter(front,front.side(1),[P1,P2,P3,P4])
+    print(survivors,distances,constraints)
 
-#   plot
-fig,ax=plt.subplots()
-Plot_sides(sides,line=True,ax=ax)
-Plot_nodes_2d(nodes,ax=ax)
-plt.show()
+    fig,ax=plt.subplots()
+    Plot_sides([front.side(slot) for slot in range(3)],line=True,ax=ax)
+    Plot_nodes_2d(nodes,ax=ax)
+    Plot_nodes_2d(nodes[survivors],ax=ax)
+    plt.show()
@@ -0,0 +1,158 @@
+"""
+Synthetic STEP files and mesh checks shared by the benchmarks and the tests.
+"""
+import numpy as np
+
+def Write_synthetic_step(file:str,n_edges:int,radius:float=100.,n_unused:int=0)->int:
+    """
+    Writes a STEP file containing one planar face bounded by a regular polygon of LINE edges.
+
+    Every 10th point name contains ';' and '=' and the edge loop is split over several lines,
+    so the file also exercises the tokenizer edge cases.
+
+    Parameters
+    ----------
+    file : str, Output file.
+    n_edges : int, Number of edges in the boundary loop.
+    radius : float, optional. Circumradius of the polygon.
+    n_unused : int, optional. Number of extra CARTESIAN_POINTs not referenced by the face.
+
+    Returns
+    -------
+    n_entities : int, Number of entities written to the DATA section.
+    """
+    theta=np.linspace(0,2*np.pi,n_edges,endpoint=False)
+    x=(radius*np.cos(theta)).tolist()
+    y=(radius*np.sin(theta)).tolist()
+
+    lines=[
+        "ISO-10303-21;",
+        "HEADER;",
+        "FILE_DESCRIPTION((''),'2;1');",
+        "FILE_NAME('synthetic.stp','',(''),(''),'','','');",
+        "FILE_SCHEMA (('AUTOMOTIVE_DESIGN { 1 0 10303 214 3 1 1 }'));",
+        "ENDSEC;",
+        "",
+        "DATA;",
+    ]
+
+    #   7 entities per edge: point, vertex, direction, vector, line, edge curve, oriented edge.
+    base=100
+    oriented_ids=[]
+    for i in range(n_edges):
+        j=(i+1)%n_edges
+        p,v,d,vec,line,curve,oriented=[base+7*i+k for k in range(7)]
+        v_next=base+7*j+1
+        dx=x[j]-x[i]
+        dy=y[j]-y[i]
+        length=float(np.hypot(dx,dy))
+        name=f"p;{i}=v" if i%10==0 else ""
+
+        lines.extend([
+            f"#{p}=CARTESIAN_POINT('{name}',({x[i]!r},{y[i]!r},0.));",
+            f"#{v}=VERTEX_POINT('',#{p});",
+            f"#{d}=DIRECTION('',({dx/length!r},{dy/length!r},0.));",
+            f"#{vec}=VECTOR('',#{d},{length!r});",
+            f"#{line}=LINE('',#{p},#{vec});",
+            f"#{curve}=EDGE_CURVE('',#{v},#{v_next},#{line},.T.);",
+            f"#{oriented}=ORIENTED_EDGE('',*,*,#{curve},.T.);",
+        ])
+        oriented_ids.append(oriented)
+
+    refs=[f"#{x}" for x in oriented_ids]
+    loop=",\n".join([",".join(refs[i:i+8]) for i in range(0,len(refs),8)])
+    lines.extend([
+        f"#1=ADVANCED_FACE('',(#2),#3,.T.);",
+        f"#2=FACE_OUTER_BOUND('',#4,.T.);",
+        f"#3=PLANE('',#5);",
+        f"#4=EDGE_LOOP('',({loop}));",
+        f"#5=AXIS2_PLACEMENT_3D('',#6,#7,#8);",
+        f"#6=CARTESIAN_POINT('',(0.,0.,0.));",
+        f"#7=DIRECTION('',(0.,0.,1.));",
+        f"#8=DIRECTION('',(1.,0.,0.));",
+    ])
+
+    unused_base=base+7*n_edges
+    for i in range(n_unused):
+        lines.append(f"#{unused_base+i}=CARTESIAN_POINT('',({float(i)!r},0.,1.));")
+
+    lines.extend(["ENDSEC;","END-ISO-10303-21;",""])
+
+    with open(file,'w') as f:
+        f.write("\n".join(lines))
+
+    return 7*n_edges+8+n_unused
+
+def Write_grid_step(file:str,n:int,size:float=10.)->None:
+    """
+    Writes a STEP file with n x n planar square faces of side size. Neighbouring faces share their
+    EDGE_CURVEs, used forwards by one face and reversed (.F.) by the other.
+    """
+    lines=[
+        "ISO-10303-21;",
+        "HEADER;",
+        "FILE_DESCRIPTION((''),'2;1');",
+        "FILE_NAME('grid.stp','',(''),(''),'','','');",
+        "FILE_SCHEMA (('AUTOMOTIVE_DESIGN { 1 0 10303 214 3 1 1 }'));",
+        "ENDSEC;",
+        "",
+        "DATA;",
+        "#1=PLANE('',#2);",
+        "#2=AXIS2_PLACEMENT_3D('',#3,#4,#5);",
+        "#3=CARTESIAN_POINT('',(0.,0.,0.));",
+        "#4=DIRECTION('',(0.,0.,1.));",
+        "#5=DIRECTION('',(1.,0.,0.));",
+        "#6=DIRECTION('',(1.,0.,0.));",
+        "#7=DIRECTION('',(0.,1.,0.));",
+        f"#8=VECTOR('',#6,{size!r});",
+        f"#9=VECTOR('',#7,{size!r});",
+    ]
+    next_id=[100]
+    def new(text):
+        lines.append(f"#{next_id[0]}={text};")
+        next_id[0]+=1
+        return next_id[0]-1
+
+    vertex={}
+    for i in range(n+1):
+        for j in range(n+1):
+            point=new(f"CARTESIAN_POINT('',({i*size!r},{j*size!r},0.))")
+            vertex[i,j]=(point,new(f"VERTEX_POINT('',#{point})"))
+
+    def edge(a,b,vector):
+        line=new(f"LINE('',#{vertex[a][0]},#{vector})")
+        return new(f"EDGE_CURVE('',#{vertex[a][1]},#{vertex[b][1]},#{line},.T.)")
+    horizontal={(i,j):edge((i,j),(i+1,j),8) for i in range(n) for j in range(n+1)}
+    vertical={(i,j):edge((i,j),(i,j+1),9) for i in range(n+1) for j in range(n)}
+
+    for i in range(n):
+        for j in range(n):
+            oriented=[
+                new(f"ORIENTED_EDGE('',*,*,#{horizontal[i,j]},.T.)"),
+                new(f"ORIENTED_EDGE('',*,*,#{vertical[i+1,j]},.T.)"),
+                new(f"ORIENTED_EDGE('',*,*,#{horizontal[i,j+1]},.F.)"),
+                new(f"ORIENTED_EDGE('',*,*,#{vertical[i,j]},.F.)"),
+            ]
+            loop=new("EDGE_LOOP('',(%s))"%",".join(f"#{x}" for x in oriented))
+            bound=new(f"FACE_OUTER_BOUND('',#{loop},.T.)")
+            new(f"ADVANCED_FACE('',(#{bound}),#1,.T.)")
+
+    lines.extend(["ENDSEC;","END-ISO-10303-21;",""])
+    with open(file,'w') as f:
+        f.write("\n".join(lines))
+
+    return None
+
+def Mesh_defects(nodes:np.ndarray,triangles:np.ndarray,boundary:np.ndarray)->int:
+    """
+    Duplicate nodes, edges of more than two panels and boundary sides not on one panel per front side
+    (an edge shared by two faces has a side in each face's front). Hanging nodes the advancing front
+    leaves in a serial run are not counted.
+    """
+    edges=np.sort(np.concatenate([triangles[:,[0,1]],triangles[:,[1,2]],triangles[:,[2,0]]]),axis=1)
+    edges,counts=np.unique(edges,axis=0,return_counts=True)
+    lookup={tuple(x):c for x,c in zip(edges.tolist(),counts.tolist())}
+    boundary,sides=np.unique(np.sort(boundary,axis=1),axis=0,return_counts=True)
+    on_boundary=np.array([lookup.get(tuple(x),0) for x in boundary.tolist()])
+
+    return (len(nodes)-len(np.unique(nodes,axis=0)))+int(np.count_nonzero(counts>2))+int(np.count_nonzero(on_boundary!=sides))
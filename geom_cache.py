@@ -0,0 +1,97 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+from geometry import PARSER_VERSION
+
+class Geom_cache():
+    """
+    On-disk cache of resolved geometry, keyed by a hash of the STEP file content, PARSER_VERSION and the
+    read options that change what is stored (e.g. mesh.read's prune and compact).
+
+    Entries are pickled face lists (points as arrays, curves, loops and faces), stored with the options
+    they were read with and only loaded for the same options. A changed source file hashes to a new
+    key, so stale entries are never loaded and age out through LRU eviction.
+
+    Parameters
+    ----------
+    directory : str, optional. Where entries are stored. Defaults to a folder in the temp directory.
+    max_bytes : int, optional. Size bound. Least recently used entries are evicted above it.
+    """
+    def __init__(self,directory:str=None,max_bytes:int=256*2**20):
+        if directory==None:
+            directory=os.path.join(tempfile.gettempdir(),'2d_unstructured_mesh_cache')
+
+        self.directory  =   directory
+        self.max_bytes  =   max_bytes
+
+        os.makedirs(self.directory,exist_ok=True)
+
+        return None
+
+    def key(self,file:str,options:dict=None)->str:
+        options=";".join(f"{k}={v!r}" for k,v in sorted((options or {}).items()))
+        h=hashlib.sha256(f"parser-{PARSER_VERSION};{options};".encode())
+        with open(file,'rb') as f:
+            for chunk in iter(lambda:f.read(1<<20),b""):
+                h.update(chunk)
+
+        return h.hexdigest()
+
+    def path(self,key:str)->str:
+        return os.path.join(self.directory,f"{key}.pkl")
+
+    def load(self,file:str,options:dict=None)->list:
+        """
+        Returns the cached faces for file read with options, or None on a miss.
+        """
+        path=self.path(self.key(file,options))
+        try:
+            with open(path,'rb') as f:
+                entry=pickle.load(f)
+        except (OSError,pickle.UnpicklingError,EOFError,AttributeError):
+            return None
+        if not isinstance(entry,dict) or entry.get('options')!=(options or {}):
+            return None
+
+        os.utime(path)  #   mtime records last use for LRU eviction
+
+        return entry['faces']
+
+    def store(self,file:str,faces:list,options:dict=None)->None:
+        path=self.path(self.key(file,options))
+
+        #   Written to a temporary file first so a concurrent run never reads a partial entry.
+        fd,tmp=tempfile.mkstemp(dir=self.directory,suffix='.tmp')
+        with os.fdopen(fd,'wb') as f:
+            pickle.dump({'options':options or {},'faces':faces},f,protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp,path)
+
+        self.evict()
+
+        return None
+
+    def evict(self)->None:
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        entries=[]
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                stat=os.stat(os.path.join(self.directory,name))
+                entries.append((stat.st_mtime,stat.st_size,name))
+
+        total=sum([x[1] for x in entries])
+        for _,size,name in sorted(entries):
+            if total<=self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory,name))
+            total-=size
+
+        return None
+
+    def clear(self)->None:
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                os.remove(os.path.join(self.directory,name))
+
+        return None
@@ -0,0 +1,154 @@
+import copy
+import os
+import warnings
+
+import numpy as np
+
+from geometry import Tokenize_chunks, Step_tokenize, Step_read, Data_sort, B_spline_curve_with_knots, Unique_nodes, Edge_loop
+from fixtures import Write_synthetic_step
+
+HERE=os.path.dirname(os.path.abspath(__file__))
+
+def test_tokenize_quoted_across_chunks():
+    text="#1=PRODUCT('a;b\nc','it''s; x');\n#2=CARTESIAN_POINT('',(0.,1.,2.));\nENDSEC;\n"
+    expected=[(1,'PRODUCT',"'a;bc','it''s; x'"),(2,'CARTESIAN_POINT',"'',(0.,1.,2.)")]
+
+    assert list(Tokenize_chunks([text]))==expected
+    for i in range(1,len(text)):
+        assert list(Tokenize_chunks([text[:i],text[i:]]))==expected
+    assert list(Tokenize_chunks(list(text)))==expected
+
+def test_tokenize_chunk_size():
+    file=os.path.join(HERE,'shape.stp')
+
+    assert list(Step_tokenize(file,chunk_size=7))==list(Step_tokenize(file))
+
+def Entity_state(value):
+    """Comparable form of an entity field: referenced entities by id, arrays as lists, other objects by their fields."""
+    if hasattr(type(value),'__slots__'):
+        return (type(value).__name__,getattr(value,'id',None))
+    if isinstance(value,np.ndarray):
+        return value.tolist()
+    if isinstance(value,(list,tuple)):
+        return [Entity_state(x) for x in value]
+    if hasattr(value,'__dict__'):   #   e.g. scipy BSpline
+        return (type(value).__name__,{k:Entity_state(v) for k,v in vars(value).items()})
+
+    return value
+
+def test_parallel_decode_matches_serial(tmp_path):
+    file=str(tmp_path/'synthetic.stp')
+    Write_synthetic_step(file,200)
+    for file in (file,os.path.join(HERE,'shape.stp')):
+        data=Step_read(file)
+        serial=Data_sort(data)
+        parallel=Data_sort(data,workers=2)
+
+        assert list(serial.keys())==list(parallel.keys())
+        assert np.array_equal(serial.points.ids,parallel.points.ids)
+        assert np.array_equal(serial.points.coords,parallel.points.coords)
+        assert np.array_equal(serial.points.kinds,parallel.points.kinds)
+        for id,obj in serial.items():
+            other=parallel[id]
+            assert type(obj) is type(other)
+            for name in type(obj).__slots__:
+                assert Entity_state(getattr(obj,name,None))==Entity_state(getattr(other,name,None)),(id,name)
+
+def Bspline_curve(ctrl_pts:np.ndarray,multiplicities:list,knots:list,degree:int=3)->B_spline_curve_with_knots:
+    from scipy.interpolate import BSpline
+
+    ids=",".join(f"#{i}" for i in range(len(ctrl_pts)))
+    curve=B_spline_curve_with_knots({'id':0,'properties':f"'',{degree},({ids}),.UNSPECIFIED.,.F.,.F.,"
+                                     f"({','.join(map(str,multiplicities))}),({','.join(map(repr,knots))}),.UNSPECIFIED."})
+    curve.ctrl_pts=ctrl_pts
+    curve.bspline=BSpline(curve.knot_vector,ctrl_pts,degree)
+
+    return curve
+
+def test_bspline_end_nodes():
+    theta=np.linspace(0,np.pi,8)
+    ctrl_pts=np.stack([10*np.cos(theta),10*np.sin(theta),np.zeros(8)],axis=1)
+
+    clamped=Bspline_curve(ctrl_pts,[4,1,1,1,1,4],[0.,.2,.4,.6,.8,1.])
+    nodes=clamped.gen_nodes(1.)
+    assert clamped.clamped()
+    assert np.array_equal(nodes[[0,-1]],ctrl_pts[[0,-1]])
+
+    #   uniform knots: the curve starts and ends away from its end control points
+    unclamped=Bspline_curve(ctrl_pts,[1]*12,np.linspace(0.,1.,12).tolist())
+    nodes=unclamped.gen_nodes(1.)
+    ends=unclamped.bspline([unclamped.knot_vector[3],unclamped.knot_vector[-4]])
+    assert not unclamped.clamped()
+    assert np.allclose(nodes[[0,-1]],ends)
+    assert not np.allclose(nodes[0],ctrl_pts[0])
+    assert np.allclose(unclamped.at_lengths(np.array([0.,unclamped.length()])),ends)
+
+def Brute_force_unique(nodes:np.ndarray,tol:float)->tuple:
+    """O(n^2) reference for Unique_nodes: components of the within-tol graph, labelled by their first node."""
+    n=len(nodes)
+    close=np.linalg.norm(nodes[:,None]-nodes[None],axis=2)<=tol
+    label=np.arange(n)
+    while True:
+        previous=label
+        label=np.where(close,label[None],n).min(axis=1)
+        if np.array_equal(label,previous):
+            break
+    first=label==np.arange(n)
+
+    return nodes[first],(np.cumsum(first)-1)[label]
+
+def test_unique_nodes_matches_brute_force():
+    rng=np.random.default_rng(0)
+    tol=1e-3
+    #   cell edges sit at (k-0.5)*8*tol from the lowest node, put nodes on and across them
+    edges=(np.arange(-1,6)-0.5)*8*tol
+    for dim in (2,3):
+        for _ in range(20):
+            base=rng.choice(edges,size=(60,dim))+rng.uniform(-1.5*tol,1.5*tol,size=(60,dim))
+            base[0]=-tol
+            #   chains of nodes each within tol of the last, across cell edges
+            chain=base[:5,None]+np.arange(4)[:,None]*0.9*tol*rng.choice([-1,1],size=dim)
+            nodes=np.concatenate([base,chain.reshape(-1,dim),base[rng.integers(0,60,10)]])
+            rng.shuffle(nodes)
+
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                unique,inverse=Unique_nodes(nodes,atol=tol,rtol=0.)
+            expected,expected_inverse=Brute_force_unique(nodes,tol)
+
+            assert np.array_equal(unique,expected)
+            assert np.array_equal(inverse,expected_inverse)
+
+def Rotated_to(loop:list,first)->list:
+    i=loop.index(first)
+    return loop[i:]+loop[:i]
+
+def Loop_with(loop:Edge_loop,edges:list)->Edge_loop:
+    other=copy.copy(loop)
+    other.edges=edges
+    other.ordered=None
+
+    return other
+
+def test_edge_loop_order_independent():
+    rng=np.random.default_rng(0)
+    for file in ('square_loop.stp','circle.stp','shape.stp'):
+        loops=[obj for obj in Data_sort(Step_read(os.path.join(HERE,file))).values() if type(obj)==Edge_loop]
+        for loop in loops:
+            expected=[edge.id for edge in loop.ordered_edges()]
+            assert len(set(expected))==len(loop.edges)
+
+            for edges in [loop.edges[::-1]]+[[loop.edges[i] for i in rng.permutation(len(loop.edges))] for _ in range(5)]:
+                other=Loop_with(loop,edges)
+                ordered=[edge.id for edge in other.ordered_edges()]
+                assert ordered==Rotated_to(expected,edges[0].id)
+
+            #   every edge used the other way round: the same loop, traversed backwards
+            flipped=[]
+            for i in rng.permutation(len(loop.edges)):
+                edge=copy.copy(loop.edges[i])
+                edge.orientation=not edge.orientation
+                flipped.append(edge)
+            other=Loop_with(loop,flipped)
+            ordered=[edge.id for edge in other.ordered_edges()]
+            assert ordered==Rotated_to(expected[::-1],flipped[0].id)
@@ -1,11 +1,14 @@
-from os import system
+import sys
+import math
+import heapq
+import itertools
 import numpy as np
-from matplotlib import pyplot as plt
 import numba as nb
 from time import time,sleep
+from concurrent.futures import ProcessPoolExecutor
 
-from geometry import Step_read, Data_sort, Remove_duplicate_nodes
-from plot_tools import Plot_nodes_3d,Plot_nodes_2d,Plot_geom,Plot_sides,Plot_panels
+from geometry import Step_read, Data_sort, Remove_duplicate_nodes, Discretisation_cache
+from geom_cache import Geom_cache
 
 import cProfile,pstats,io
 profiler=cProfile.Profile()
@@ -13,9 +16,17 @@ profiler=cProfile.Profile()
 class StepException(Exception):
     pass
 
+def arccos(x:float)->float:
+    """
+    np.arccos of a scalar through libm, as the compiled kernel computes it. numpy may use SIMD code that
+    differs in the last bit depending on the CPU. NaN outside [-1,1], like np.arccos.
+    """
+    return math.acos(x) if -1<=x<=1 else np.nan
+
 class Panel():
     """
-    Mesh panel object. Currently consists only of corner points.
+    Mesh panel object. Currently consists only of corner points. Meshes keep their panels as node and
+    connectivity arrays (Mesh.nodes, Mesh.triangles); Mesh.panels builds these on demand.
 
     Parameters:
     ----------
@@ -29,10 +40,13 @@ class Panel():
         self.C=C
         self.D=D
 
-        if D==None:
-            self.points=np.array([A,B,C,A])
+    @property
+    def points(self)->np.ndarray:
+        """Closed loop of corner points, built on access."""
+        if self.D is None:
+            return np.array([self.A,self.B,self.C,self.A])
         else:
-            self.points=np.array([A,B,C,D,A])
+            return np.array([self.A,self.B,self.C,self.D,self.A])
 
 class Front_side():
     """
@@ -44,10 +58,13 @@ class Front_side():
     A, B : np.ndarray; Beginning and end coordinates.
     orientation: bool; Determines which direction new nodes are generated.
     axis: geometry.Axis2_placement_3d; Axis object defining plane on which side lies. Used for calculating local definition along side.
+    ids: tuple, optional; Node ids of A and B, see geometry.Discretisation_cache and Front.
     """
-    def __init__(self,A:np.ndarray,B:np.ndarray,orientation:bool,vect_out_plane:np.array):
+    def __init__(self,A:np.ndarray,B:np.ndarray,orientation:bool,vect_out_plane:np.array,ids:tuple=None):
         self.A=A
         self.B=B
+        self.ids=ids
+        self.slot=None  #   row in the Front side arrays, for sides read from a Front
         self.orientation=orientation
         self.vect_out_plane=vect_out_plane
 
@@ -63,76 +80,1052 @@ class Front_side():
 
         return None
 
+class Node_grid():
+    """
+    Uniform bucket grid over the end nodes of the front sides. Each side is entered under the cells of
+    its nodes A and B, so a radius query only visits the cells overlapping the search sphere.
+
+    Parameters:
+    -----------
+    cell: float; Cell size, about the node spacing.
+    """
+    def __init__(self,cell:float):
+        self.cell=cell
+        self.buckets={}     #   cell index -> {(slot,end): None}, end 0 for A and 1 for B
+
+        return None
+
+    def key(self,node:np.ndarray)->tuple:
+        return tuple(int(x) for x in np.floor(node/self.cell))
+
+    def add(self,slot:int,A:np.ndarray,B:np.ndarray)->None:
+        for end,node in enumerate((A,B)):
+            self.buckets.setdefault(self.key(node),{})[(slot,end)]=None
+
+        return None
+
+    def remove(self,slot:int,A:np.ndarray,B:np.ndarray)->None:
+        for end,node in enumerate((A,B)):
+            key=self.key(node)
+            bucket=self.buckets[key]
+            del bucket[(slot,end)]
+            if not bucket:
+                del self.buckets[key]
+
+        return None
+
+    def query(self,centre:np.ndarray,r:float)->list:
+        """Returns the (slot,end) entries in the cells overlapping the sphere of radius r around centre."""
+        lo=self.key(centre-r)
+        hi=self.key(centre+r)
+        entries=[]
+        for cell in np.ndindex(*[b-a+1 for a,b in zip(lo,hi)]):
+            bucket=self.buckets.get(tuple(a+c for a,c in zip(lo,cell)))
+            if bucket:
+                entries.extend(bucket)
+
+        return entries
+
+class Segment_grid():
+    """
+    Uniform bucket grid over the front sides as segments. Each side is entered under every cell its
+    bounding box overlaps, so a box query returns all sides that can reach into the box.
+
+    Parameters:
+    -----------
+    cell: float; Cell size, about the node spacing.
+    """
+    def __init__(self,cell:float):
+        self.cell=cell
+        self.buckets={}     #   cell index -> {slot: None}
+
+        return None
+
+    def cells(self,lo:np.ndarray,hi:np.ndarray):
+        lo=np.floor(lo/self.cell).astype(int).tolist()
+        hi=np.floor(hi/self.cell).astype(int).tolist()
+
+        return itertools.product(*[range(a,b+1) for a,b in zip(lo,hi)])
+
+    def add(self,slot:int,A:np.ndarray,B:np.ndarray)->None:
+        for key in self.cells(np.minimum(A,B),np.maximum(A,B)):
+            self.buckets.setdefault(key,{})[slot]=None
+
+        return None
+
+    def remove(self,slot:int,A:np.ndarray,B:np.ndarray)->None:
+        for key in self.cells(np.minimum(A,B),np.maximum(A,B)):
+            bucket=self.buckets[key]
+            del bucket[slot]
+            if not bucket:
+                del self.buckets[key]
+
+        return None
+
+    def query(self,lo:np.ndarray,hi:np.ndarray)->list:
+        """Returns the slots of the sides in the cells overlapping the box lo-hi."""
+        slots={}
+        for key in self.cells(lo,hi):
+            bucket=self.buckets.get(key)
+            if bucket:
+                slots.update(bucket)
+
+        return list(slots)
+
 class Front():
-    def __init__(self,sides:list):
-        """Dynamic front object composed of individual tri panel sides."""
-        self.sides=sides
+    """
+    Dynamic front composed of tri panel sides, stored as arrays.
 
-        self.nodes=self.get_nodes()
+    Nodes live in one coordinate table (points) and are identified by their row. Sides are rows of
+    node id pairs in preallocated arrays; removed rows go on a free list and are reused, so adding and
+    removing a side is O(1). Each node keeps the slots of the sides ending on it, so the sides meeting
+    at a node are found in O(degree). The next side to process comes off a heap keyed by the selection
+    strategy; removed sides stay in the heap and are skipped when they surface. Node and segment grids
+    serve the radius and crossing queries.
+
+    Parameters:
+    -----------
+    sides: list[Front_side]; Initial sides.
+    boundary: geometry.Discretisation_cache, optional; Boundary nodes the side ids refer to. Without it,
+        side ends with equal coordinates are the same node.
+    select: str or callable, optional; Selection strategy, see Front.select.
+    """
+    def __init__(self,sides:list,boundary:Discretisation_cache=None,select='oldest'):
+        self.boundary=boundary
+
+        if boundary is not None:
+            points=boundary.nodes
+            ends=[side.ids for side in sides]
+        else:
+            lookup={}
+            for side in sides:
+                for node in (side.A,side.B):
+                    lookup.setdefault(tuple(node.tolist()),node)
+            ids={key:i for i,key in enumerate(lookup)}
+            points=np.array(list(lookup.values()),dtype=float).reshape(-1,3)
+            ends=[(ids[tuple(side.A.tolist())],ids[tuple(side.B.tolist())]) for side in sides]
+
+        self.n_points=len(points)
+        self.points=np.zeros([max(2*self.n_points,16),3])
+        self.points[:self.n_points]=points
+
+        capacity=max(2*len(sides),16)
+        self.side_nodes=np.zeros([capacity,2],dtype=np.int64)
+        self.orientation=np.zeros(capacity,dtype=bool)
+        self.normal=np.zeros([capacity,3])
+        self.seq=np.zeros(capacity,dtype=np.int64)     #   insertion order
+        self.layer=np.zeros(capacity,dtype=np.int64)   #   0 for the boundary, +1 for sides made from a side
+        self.alive=np.zeros(capacity,dtype=bool)
+        self.n_slots=0      #   rows in use or on the free list
+        self.free=[]
+        self.n_sides=0
+        self.count=0        #   sides ever added
+        self.heap=[]        #   (key,seq,slot), stale entries skipped
+        self.selection='oldest'
+        self.key=SELECTION['oldest']
+        self.next_layer=0   #   layer of the sides being added
+        self.incident={}    #   node id -> {slot: None} of the active sides ending on it
+        self.grid=None
+        self.segments=None
+
+        self.select(select)
+        for side,(a,b) in zip(sides,ends):
+            self.add_side(a,b,side.orientation,side.vect_out_plane)
 
         return None
-    
+
+    def __len__(self)->int:
+        return self.n_sides
+
     def __call__(self,index:int)->Front_side:
         return self.sides[index]
 
+    @property
+    def sides(self)->list:
+        """Active sides oldest first, as Front_side objects."""
+        slots=np.flatnonzero(self.alive[:self.n_slots])
+        return [self.side(slot) for slot in slots[np.argsort(self.seq[slots],kind='stable')]]
+
+    @property
+    def nodes(self)->np.ndarray:
+        return self.get_nodes()
+
+    def get_nodes(self):
+        nodes=[]
+        for side in self.sides:
+            nodes.extend([side.A,side.B])
+
+        return np.array(nodes)
+
+    def planes(self)->tuple:
+        """
+        Distinct plane normals of the active sides.
+
+        Returns:
+        --------
+        normals: np.ndarray; (F,3) plane normals.
+        plane: np.ndarray; Row in normals of each slot's normal, -1 for inactive slots.
+        """
+        slots=np.flatnonzero(self.alive[:self.n_slots])
+        normals,inverse=np.unique(self.normal[slots],axis=0,return_inverse=True)
+        plane=np.full(self.n_slots,-1,dtype=np.int64)
+        plane[slots]=inverse.ravel()
+
+        return normals,plane
+
+    def oriented_sides(self)->np.ndarray:
+        """
+        (k,2) node ids of the active sides oldest first, reversed where orientation is False so that the
+        domain is on the left of a->b about the normal, as for orientation True.
+        """
+        slots=np.flatnonzero(self.alive[:self.n_slots])
+        slots=slots[np.argsort(self.seq[slots],kind='stable')]
+        a,b=self.side_nodes[slots].T
+        flip=~self.orientation[slots]
+
+        return np.stack([np.where(flip,b,a),np.where(flip,a,b)],axis=1)
+
+    def area(self)->float:
+        """
+        Area enclosed by the front, summed over its planes: half the normal component of the sum of A x B
+        over the sides of each plane. Holes are subtracted as long as their sides run the opposite way.
+        """
+        slots=np.flatnonzero(self.alive[:self.n_slots])
+        A=self.points[self.side_nodes[slots,0]]
+        B=self.points[self.side_nodes[slots,1]]
+        normals,plane=self.planes()
+        twice=np.einsum('ij,ij->i',self.normal[slots],np.cross(A,B))
+
+        return 0.5*float(np.abs(np.bincount(plane[slots],twice,minlength=len(normals))).sum())
+
+    def side(self,slot:int)->Front_side:
+        """Front_side view of a row, with its node ids and slot."""
+        a,b=self.side_nodes[slot]
+        side=Front_side(self.points[a],self.points[b],bool(self.orientation[slot]),self.normal[slot],ids=(int(a),int(b)))
+        side.slot=int(slot)
+
+        return side
+
+    def add_node(self,point:np.ndarray)->int:
+        if self.n_points==len(self.points):
+            self.points=np.concatenate([self.points,np.zeros_like(self.points)])
+        self.points[self.n_points]=point
+        self.n_points+=1
+
+        return self.n_points-1
+
+    def add_side(self,a:int,b:int,orientation:bool,vect_out_plane:np.ndarray)->int:
+        if self.free:
+            slot=self.free.pop()
+        else:
+            if self.n_slots==len(self.alive):
+                for name in ('side_nodes','orientation','normal','seq','layer','alive'):
+                    array=getattr(self,name)
+                    setattr(self,name,np.concatenate([array,np.zeros_like(array)]))
+            slot=self.n_slots
+            self.n_slots+=1
+
+        self.side_nodes[slot]=a,b
+        self.orientation[slot]=orientation
+        self.normal[slot]=vect_out_plane
+        self.seq[slot]=self.count
+        self.layer[slot]=self.next_layer
+        self.alive[slot]=True
+        heapq.heappush(self.heap,(self.key(self,slot),self.count,slot))
+        self.count+=1
+        self.n_sides+=1
+        for node in (int(a),int(b)):
+            self.incident.setdefault(node,{})[slot]=None
+        if self.grid is not None:
+            self.grid.add(slot,self.points[a],self.points[b])
+        if self.segments is not None:
+            self.segments.add(slot,self.points[a],self.points[b])
+
+        return slot
+
+    def remove_side(self,slot:int)->None:
+        self.alive[slot]=False
+        self.free.append(slot)
+        self.n_sides-=1
+        a,b=self.side_nodes[slot]
+        for node in (int(a),int(b)):
+            sides=self.incident[node]
+            del sides[slot]
+            if not sides:
+                del self.incident[node]
+        if self.grid is not None:
+            self.grid.remove(slot,self.points[a],self.points[b])
+        if self.segments is not None:
+            self.segments.remove(slot,self.points[a],self.points[b])
+
+        return None
+
     def update(self,add:list,remove:list)->None:
         """
         Updates front by removing and adding tri panel sides.
 
         Parameters:
         ----------
-        add, remove: list[Front_side]; Side objects to add and remove to the front.
+        add: list[tuple]; (a,b,orientation,vect_out_plane) of the sides to add, a and b node ids.
+        remove: list[int]; Slots of the sides to remove.
 
         Returns:
         --------
         None - Front is updated inplace. 
         """
-        try:
-            self.sides=[side for side in self.sides if side not in remove]    #   Remove inactive sides
-        except TypeError as e:
-            print(e)
-            print(self.sides,remove)
-            exit()
+        for slot in remove:
+            self.remove_side(slot)
+        for a,b,orientation,vect_out_plane in add:
+            self.add_side(a,b,orientation,vect_out_plane)
+
+        return None
+
+    def select(self,select)->None:
+        """
+        Sets the order sides are processed in and rebuilds the heap.
+
+        Parameters:
+        ----------
+        select: str or callable; 'oldest' (first in, first out), 'shortest' (shortest side first, then
+            oldest), 'layer' (boundary sides, then the sides made from them, and so on) or key(front,slot)
+            returning a sortable value, smallest first. The key is taken when a side is added.
+        """
+        self.selection=select
+        self.key=SELECTION[select] if isinstance(select,str) else select
+        slots=np.flatnonzero(self.alive[:self.n_slots])
+        self.heap=[(self.key(self,slot),self.seq[slot],slot) for slot in slots.tolist()]
+        heapq.heapify(self.heap)
 
-        self.sides.extend(add)    #   Add new active sides
+        return None
 
-        self.nodes=self.get_nodes() #   refresh node list
+    def next_side(self)->int:
+        """
+        Slot of the next side to process, None once the front is empty. The side stays in the front,
+        sides added until the next call are one layer on from it.
+        """
+        while self.heap:
+            key,seq,slot=self.heap[0]
+            if self.alive[slot] and self.seq[slot]==seq:
+                self.next_layer=self.layer[slot]+1
+                return slot
+            heapq.heappop(self.heap)
 
         return None
 
-    def get_nodes(self):
-        nodes=[]
-        for side in self.sides:
-            A=side.A
-            B=side.B
+    def sides_at(self,node:int)->list:
+        """Slots of the active sides with node as an end, oldest first."""
+        return sorted(self.incident.get(node,()),key=self.seq.__getitem__)
 
-            nodes.extend([A,B])
+    def nodes_near(self,centre:np.ndarray,r:float)->np.ndarray:
+        """
+        Ids of the front nodes in the grid cells overlapping the sphere of radius r around centre, first
+        seen oldest side first, A before B. The grid is built with cell size r on the first call.
+        """
+        if self.grid is None or self.grid.cell!=r:
+            self.grid=Node_grid(r)
+            for slot in np.flatnonzero(self.alive[:self.n_slots]):
+                a,b=self.side_nodes[slot]
+                self.grid.add(slot,self.points[a],self.points[b])
 
-        return np.array(nodes)
+        entries=sorted(self.grid.query(centre,r),key=lambda x:(self.seq[x[0]],x[1]))
+
+        return np.array(list(dict.fromkeys(int(self.side_nodes[slot,end]) for slot,end in entries)),dtype=np.int64)
+
+    def edges_cross(self,a:int,b:int,nodes:np.ndarray,cell:float,axes:np.ndarray)->np.ndarray:
+        """
+        Checks the edges from nodes a and b to each of nodes against the front sides in the cells they pass
+        through. Sides ending on either end of an edge do not count, nor do sides that only touch or overlap
+        it. The check is on the current side's plane, in the in plane axes from plane_axes. The segment grid
+        is built with cell size cell on the first call.
+
+        Parameters:
+        ----------
+        a, b: int; Node ids the edges start from, the ends of the current side.
+        nodes: np.ndarray; (k,) node ids the edges end on.
+        cell: float; Grid cell size.
+        axes: np.ndarray; (2,3) in plane axes u,v of the current side's plane.
+
+        Returns:
+        --------
+        crosses: np.ndarray; (k,) True where the edge from a or from b crosses a side.
+        """
+        if self.segments is None or self.segments.cell!=cell:
+            self.segments=Segment_grid(cell)
+            for slot in np.flatnonzero(self.alive[:self.n_slots]):
+                A,B=self.points[self.side_nodes[slot]]
+                self.segments.add(slot,A,B)
+
+        if len(nodes)==0:
+            return np.zeros(0,dtype=bool)
+
+        k=len(nodes)
+        starts=np.repeat([a,b],k)
+        P=self.points[starts]   #   (2k,3) edges P-Q, from a then from b
+        Q=self.points[np.tile(nodes,2)]
+        slots=self.segments.query(np.minimum(P.min(axis=0),Q.min(axis=0)),np.maximum(P.max(axis=0),Q.max(axis=0)))
+        if not slots:
+            return np.zeros(k,dtype=bool)
+
+        ends=self.side_nodes[slots]
+        #   in plane coordinates, summed left to right as dot3 in the compiled kernel
+        X=np.concatenate([P,Q,self.points[ends.T.ravel()]])
+        X=(X[:,0,None]*axes[:,0]+X[:,1,None]*axes[:,1])+X[:,2,None]*axes[:,2]
+        P,Q=X[:2*k,None,:],X[2*k:4*k,None,:]
+        U,V=X[None,4*k:4*k+len(slots)],X[None,4*k+len(slots):]     #   (1,s,2) sides U-V
+        d=Q-P
+        e=V-U
+
+        #   Strictly opposite turns at both segments.
+        o_U=d[...,0]*(U[...,1]-P[...,1])-d[...,1]*(U[...,0]-P[...,0])
+        o_V=d[...,0]*(V[...,1]-P[...,1])-d[...,1]*(V[...,0]-P[...,0])
+        o_P=e[...,0]*(P[...,1]-U[...,1])-e[...,1]*(P[...,0]-U[...,0])
+        o_Q=e[...,0]*(Q[...,1]-U[...,1])-e[...,1]*(Q[...,0]-U[...,0])
+        crosses=(o_U*o_V<0)&(o_P*o_Q<0)
+
+        edge_ends=np.stack([starts,np.tile(nodes,2)],axis=1)
+        touching=(ends[None,:,0,None]==edge_ends[:,None,:]).any(axis=2)|(ends[None,:,1,None]==edge_ends[:,None,:]).any(axis=2)
+
+        return np.any(crosses&~touching,axis=1).reshape(2,k).any(axis=0)
+
+SELECTION={
+    'oldest':lambda front,slot:0,
+    'shortest':lambda front,slot:float(np.linalg.norm(np.diff(front.points[front.side_nodes[slot]],axis=0))),
+    'layer':lambda front,slot:int(front.layer[slot]),
+}
+
+SELECTION_CODES={'oldest':0,'shortest':1,'layer':2}
+
+NEW_NODE_HALVINGS=8     #   times a new node of case 1a/1b is pulled in before it is kept crossing
+
+@nb.jit(nopython=True,cache=True)
+def grow(array:np.ndarray)->np.ndarray:
+    return np.concatenate((array,np.zeros_like(array)))
+
+@nb.jit(nopython=True,cache=True)
+def heap_less(keys,seqs,i,j)->bool:
+    return keys[i]<keys[j] or (keys[i]==keys[j] and seqs[i]<seqs[j])
+
+@nb.jit(nopython=True,cache=True)
+def heap_push(keys,seqs,slots,n,key,seq,slot)->int:
+    """Pushes (key,seq,slot) onto the binary heap of size n held in keys, seqs and slots. Returns the new size."""
+    keys[n],seqs[n],slots[n]=key,seq,slot
+    i=n
+    while i>0:
+        parent=(i-1)//2
+        if not heap_less(keys,seqs,i,parent):
+            break
+        keys[i],keys[parent]=keys[parent],keys[i]
+        seqs[i],seqs[parent]=seqs[parent],seqs[i]
+        slots[i],slots[parent]=slots[parent],slots[i]
+        i=parent
+
+    return n+1
+
+@nb.jit(nopython=True,cache=True)
+def heap_pop(keys,seqs,slots,n)->int:
+    """Drops the top of the heap of size n. Returns the new size."""
+    n-=1
+    keys[0],seqs[0],slots[0]=keys[n],seqs[n],slots[n]
+    i=0
+    while True:
+        child=2*i+1
+        if child>=n:
+            break
+        if child+1<n and heap_less(keys,seqs,child+1,child):
+            child+=1
+        if not heap_less(keys,seqs,child,i):
+            break
+        keys[i],keys[child]=keys[child],keys[i]
+        seqs[i],seqs[child]=seqs[child],seqs[i]
+        slots[i],slots[child]=slots[child],slots[i]
+        i=child
+
+    return n
+
+@nb.jit(nopython=True,cache=True)
+def cell_key(point:np.ndarray,cell:float)->int:
+    key=0
+    for k in range(3):
+        key=key*(1<<21)+int(np.floor(point[k]/cell))+(1<<20)
+
+    return key
+
+@nb.jit(nopython=True,cache=True)
+def incident_sides(node,side_seq,inc_head,inc_next)->np.ndarray:
+    """Slots of the sides with node as an end, oldest first (Front.sides_at)."""
+    n=0
+    e=inc_head[node]
+    while e>=0:
+        n+=1
+        e=inc_next[e]
+    slots=np.empty(n,dtype=np.int64)
+    n=0
+    e=inc_head[node]
+    while e>=0:
+        slots[n]=e//2
+        n+=1
+        e=inc_next[e]
+
+    return slots[np.argsort(side_seq[slots],kind='mergesort')]
+
+@nb.jit(nopython=True,cache=True)
+def vector_norm(vector:np.ndarray)->float:
+    """np.linalg.norm as numpy computes it, so results match the Python engine bit for bit."""
+    return np.sqrt(np.dot(vector,vector))
+
+@nb.jit(nopython=True,cache=True)
+def dot3(u:np.ndarray,v:np.ndarray)->float:
+    """Dot product summed left to right, as the batched products in Mesh.angle_cosines."""
+    return u[0]*v[0]+u[1]*v[1]+u[2]*v[2]
+
+@nb.jit(nopython=True,cache=True)
+def node_cosines(A,B,vector,length,node)->tuple:
+    """Mesh.angle_cosines for one node: (cos_A,cos_B)."""
+    node2A=A-node
+    B2node=node-B
+    node2A_mod=np.sqrt(dot3(node2A,node2A))
+    B2node_mod=np.sqrt(dot3(B2node,B2node))
+    cos_A=dot3(node2A,vector)/(node2A_mod*length) if node2A_mod*length!=0 else -1.
+    cos_B=dot3(B2node,vector)/(B2node_mod*length) if B2node_mod*length!=0 else -1.
+
+    return cos_A,cos_B
+
+@nb.jit(nopython=True,cache=True)
+def side_direction(A,B,y,node)->tuple:
+    """Mesh.side_direction for one node: (d_node,d_side_in), same sign if node is on the y side of AB."""
+    d_side_in=(A[0]+1*y[0]-A[0])*(B[1]-A[1])-(A[1]+1*y[1]-A[1])*(B[0]-A[0])
+    d_node=(node[0]-A[0])*(B[1]-A[1])-(node[1]-A[1])*(B[0]-A[0])
+
+    return d_node,d_side_in
+
+@nb.jit(nopython=True,cache=True)
+def plane_axes(normal:np.ndarray)->np.ndarray:
+    """(2,3) unit in plane axes u,v of the plane with unit normal, (u,v,normal) right handed."""
+    e=np.zeros(3)
+    e[np.argmin(np.abs(normal))]=1.
+    axes=np.empty((2,3))
+    axes[0]=np.cross(e,normal)
+    axes[0]/=np.sqrt(dot3(axes[0],axes[0]))
+    axes[1]=np.cross(normal,axes[0])
+
+    return axes
+
+@nb.jit(nopython=True,cache=True)
+def edges_cross(points,a,b,c,cell,axes,segments,e_slot,e_seq,e_next,s_nodes,s_seq,s_alive)->bool:
+    """
+    Front.edges_cross for one node c: True if edge a-c or b-c crosses a live side in the segment grid,
+    on the plane with in plane axes axes. Grid entries are (slot,seq) chained through e_next; entries of
+    removed sides are skipped.
+    """
+    Qu=dot3(points[c],axes[0])
+    Qv=dot3(points[c],axes[1])
+    lo=np.floor(np.minimum(np.minimum(points[a],points[b]),points[c])/cell)
+    hi=np.floor(np.maximum(np.maximum(points[a],points[b]),points[c])/cell)
+    for i in range(int(lo[0]),int(hi[0])+1):
+        for j in range(int(lo[1]),int(hi[1])+1):
+            for k in range(int(lo[2]),int(hi[2])+1):
+                key=((i+(1<<20))*(1<<21)+j+(1<<20))*(1<<21)+k+(1<<20)
+                e=segments[key] if key in segments else -1
+                while e>=0:
+                    slot=e_slot[e]
+                    live=s_alive[slot] and s_seq[slot]==e_seq[e]
+                    e=e_next[e]
+                    if not live:
+                        continue
+                    u=s_nodes[slot,0]
+                    v=s_nodes[slot,1]
+                    Uu=dot3(points[u],axes[0])
+                    Uv=dot3(points[u],axes[1])
+                    Vu=dot3(points[v],axes[0])
+                    Vv=dot3(points[v],axes[1])
+                    for start in (a,b):
+                        if u==start or v==start or u==c or v==c:
+                            continue
+                        Pu=dot3(points[start],axes[0])
+                        Pv=dot3(points[start],axes[1])
+                        d0=Qu-Pu
+                        d1=Qv-Pv
+                        e0=Vu-Uu
+                        e1=Vv-Uv
+                        o_U=d0*(Uv-Pv)-d1*(Uu-Pu)
+                        o_V=d0*(Vv-Pv)-d1*(Vu-Pu)
+                        o_P=e0*(Pv-Uv)-e1*(Pu-Uu)
+                        o_Q=e0*(Qv-Uv)-e1*(Qu-Uu)
+                        if o_U*o_V<0 and o_P*o_Q<0:
+                            return True
+
+    return False
+
+@nb.jit(nopython=True,cache=True)
+def advance_front(points,n_points,side_nodes,orientation,plane,normals,layer,spacing,select,n_panels):
+    """
+    Compiled advancing front, the whole loop of Mesh.advancing_front over preallocated arrays.
+
+    Arguments:
+        points: {np.ndarray} -- Node coordinates, the first n_points rows in use.
+        n_points: {int} -- Number of nodes.
+        side_nodes: {np.ndarray} -- (k,2) node ids of the front sides, oldest first.
+        orientation, plane, layer: {np.ndarray} -- Per side orientation, row in normals and layer.
+        normals: {np.ndarray} -- (F,3) plane normals.
+        spacing: {float} -- Target spacing between nodes.
+        select: {int} -- Selection strategy, see SELECTION_CODES.
+        n_panels: {int} -- Expected number of panels, the output arrays start this size and double.
+
+    Returns:
+        points: {np.ndarray} -- (N,3) node coordinates, boundary nodes first.
+        triangles: {np.ndarray} -- (M,3) int32 node ids A,B,C of the panels, in the order generated.
+        planes: {np.ndarray} -- (M,) int32 row in normals of each panel.
+    """
+    n_initial=len(side_nodes)
+    capacity=max(2*n_initial,16)
+    s_nodes=np.zeros((capacity,2),dtype=np.int64)
+    s_orientation=np.zeros(capacity,dtype=np.bool_)
+    s_plane=np.zeros(capacity,dtype=np.int64)
+    s_seq=np.zeros(capacity,dtype=np.int64)
+    s_layer=np.zeros(capacity,dtype=np.int64)
+    s_alive=np.zeros(capacity,dtype=np.bool_)
+    inc_next=np.full(2*capacity,-1,dtype=np.int64)  #   incident lists, entry 2*slot+end
+    inc_prev=np.full(2*capacity,-1,dtype=np.int64)
+    free=np.zeros(capacity,dtype=np.int64)
+    n_free=0
+    n_slots=0
+    count=0
+
+    h_keys=np.zeros(2*capacity)
+    h_seqs=np.zeros(2*capacity,dtype=np.int64)
+    h_slots=np.zeros(2*capacity,dtype=np.int64)
+    n_heap=0
+
+    points_=points
+    points=np.zeros((max(len(points_),n_points+n_panels//2+1),3))  #   about one node per two panels
+    points[:n_points]=points_[:n_points]
+    inc_head=np.full(len(points),-1,dtype=np.int64)
+    cell_next=np.full(len(points),-1,dtype=np.int64)
+    cells=dict()        #   cell key -> first node in cell, chained through cell_next
+    r=1*spacing
+    for node in range(n_points):
+        key=cell_key(points[node],r)
+        if key in cells:
+            cell_next[node]=cells[key]
+        cells[key]=node
+
+    segments=dict()     #   cell key -> first segment grid entry, chained through e_next
+    e_slot=np.zeros(4*capacity,dtype=np.int64)
+    e_seq=np.zeros(4*capacity,dtype=np.int64)
+    e_next=np.zeros(4*capacity,dtype=np.int64)
+    n_entries=0
+
+    axes=np.zeros((len(normals),2,3))   #   in plane axes of each plane, for edges_cross
+    for i in range(len(normals)):
+        axes[i]=plane_axes(normals[i])
+
+    triangles=np.zeros((max(n_panels,16),3),dtype=np.int32)
+    planes=np.zeros(max(n_panels,16),dtype=np.int32)
+    n_triangles=0
+
+    new_sides=np.zeros((2,2),dtype=np.int64)
+    new_orientation=np.zeros(2,dtype=np.bool_)
+    new_plane=np.zeros(2,dtype=np.int64)
+    new_layer=0
+    remove=np.zeros(3,dtype=np.int64)
+    n_new=0
+    n_remove=0
+
+    dy=np.sqrt(spacing**2-(spacing/2)**2)
+
+    pending=True    #   initial sides still to add
+    while True:
+        if pending:
+            n_new=n_initial
+            n_remove=0
+        else:
+            ####    Next side    ####
+            slot=-1
+            while n_heap>0:
+                top=h_slots[0]
+                if s_alive[top] and s_seq[top]==h_seqs[0]:
+                    slot=top
+                    break
+                n_heap=heap_pop(h_keys,h_seqs,h_slots,n_heap)
+            if slot<0:
+                break
+            new_layer=s_layer[slot]+1
+
+            a=s_nodes[slot,0]
+            b=s_nodes[slot,1]
+            A=points[a]
+            B=points[b]
+            side_plane=s_plane[slot]
+            vect_out_plane=normals[side_plane]
+            side_orientation=s_orientation[slot]
+            vector=B-A
+            dx=vector_norm(vector)
+            x=vector/dx
+            y=np.empty(3)
+            y[0]=x[1]*vect_out_plane[2]-x[2]*vect_out_plane[1]
+            y[1]=x[2]*vect_out_plane[0]-x[0]*vect_out_plane[2]
+            y[2]=x[0]*vect_out_plane[1]-x[1]*vect_out_plane[0]
+            if side_orientation:
+                y=-y
+
+            C_ideal=A+x*dx/2+y*dy
+            if not np.all(np.isfinite(C_ideal)):
+                raise ValueError("Ideal node is not finite, the front has a zero length side.")
+
+            ####    Constraining sides    ####
+            adjacent=np.concatenate((incident_sides(a,s_seq,inc_head,inc_next),incident_sides(b,s_seq,inc_head,inc_next)))
+            L_cos=1.
+            R_cos=1.
+            L_slot=-1
+            R_slot=-1
+            for i in range(len(adjacent)):
+                adj=adjacent[i]
+                if adj==slot:
+                    continue
+                repeat=False
+                for j in range(i):
+                    if adjacent[j]==adj:
+                        repeat=True
+                if repeat:
+                    continue
+
+                adj_a=s_nodes[adj,0]
+                adj_b=s_nodes[adj,1]
+                if adj_a==a or adj_b==a and adj_a!=b:
+                    connect_A=True
+                    P=points[adj_a]
+                else:
+                    connect_A=False
+                    P=points[adj_b]
+
+                d_node,d_current_in=side_direction(A,B,y,P)
+                if not d_node*d_current_in>0:
+                    continue
+
+                cos_A,cos_B=node_cosines(A,B,vector,dx,P)
+                if connect_A:
+                    if cos_A<L_cos:
+                        L_cos=cos_A
+                        L_slot=adj
+                else:
+                    if cos_B<R_cos:
+                        R_cos=cos_B
+                        R_slot=adj
+
+            ####    Candidate nodes    ####
+            c=-1
+            min_dist=1e99
+            min_order=-1
+            lo=np.floor((C_ideal-r)/r)
+            hi=np.floor((C_ideal+r)/r)
+            for i in range(int(lo[0]),int(hi[0])+1):
+                for j in range(int(lo[1]),int(hi[1])+1):
+                    for k in range(int(lo[2]),int(hi[2])+1):
+                        key=((i+(1<<20))*(1<<21)+j+(1<<20))*(1<<21)+k+(1<<20)
+                        node=cells[key] if key in cells else -1
+                        while node>=0:
+                            candidate=node
+                            node=cell_next[node]
+                            if inc_head[candidate]<0 or candidate==a or candidate==b:
+                                continue
+                            dist=np.linalg.norm(points[candidate]-C_ideal)
+                            if not dist<=r:
+                                continue
+
+                            #   angle constraints, as Mesh.filter_near_nodes
+                            P=points[candidate]
+                            cos_A,cos_B=node_cosines(A,B,vector,dx,P)
+                            if not (cos_A<=L_cos and cos_B<=R_cos):
+                                continue
+                            d_node,d_current_in=side_direction(A,B,y,P)
+                            if not d_node*d_current_in>0:
+                                continue
+                            if edges_cross(points,a,b,candidate,r,axes[side_plane],segments,e_slot,e_seq,e_next,s_nodes,s_seq,s_alive):
+                                continue
+
+                            #   nearest wins, ties to the node first seen on the oldest side
+                            order=1<<62
+                            e=inc_head[candidate]
+                            while e>=0:
+                                order=min(order,2*s_seq[e//2]+e%2)
+                                e=inc_next[e]
+                            if dist<min_dist or (dist==min_dist and order<min_order):
+                                min_dist=dist
+                                min_order=order
+                                c=candidate
+
+            n_new=0
+            n_remove=0
+            if c<0:
+                cos_A,cos_B=node_cosines(A,B,vector,dx,C_ideal)
+                inside_A=cos_A<=L_cos
+                inside_B=cos_B<=R_cos
+
+                if inside_A and inside_B:
+                    #   Case 1a:
+                    C=C_ideal
+                    towards=A+x*dx/2
+                    new_sides[0,0],new_sides[0,1]=n_points,b
+                    new_sides[1,0],new_sides[1,1]=a,n_points
+                    n_new=2
+                    remove[0]=slot
+                    n_remove=1
+                else:
+                    #   Case 1b:
+                    h=np.sqrt((dx/2)**2+(dy)**2)
+                    if not inside_A:
+                        theta=180-np.rad2deg(np.arccos(L_cos))
+                        dx_=h*np.cos(np.deg2rad(theta))
+                        dy_=h*np.sin(np.deg2rad(theta))
+                        C=A+dx_*x+dy_*y
+                        towards=A
+                        new_sides[0,0],new_sides[0,1]=n_points,b
+                        new_sides[1,0],new_sides[1,1]=s_nodes[L_slot,0],n_points
+                        constraint=L_slot
+                    else:
+                        theta=180-np.rad2deg(np.arccos(R_cos))
+                        dx_=dx-h*np.cos(np.deg2rad(theta))
+                        dy_=h*np.sin(np.deg2rad(theta))
+                        C=A+dx_*x+dy_*y
+                        towards=B
+                        new_sides[0,0],new_sides[0,1]=a,n_points
+                        new_sides[1,0],new_sides[1,1]=n_points,s_nodes[R_slot,1]
+                        constraint=R_slot
+                    new_orientation[1]=s_orientation[constraint]
+                    new_plane[1]=s_plane[constraint]
+                    n_new=2
+                    remove[0]=constraint
+                    remove[1]=slot
+                    n_remove=2
+                new_orientation[0]=side_orientation
+                new_plane[0]=side_plane
+                if n_remove==1:
+                    new_orientation[1]=side_orientation
+                    new_plane[1]=side_plane
+
+                if n_points==len(points):
+                    points=grow(points)
+                    inc_head=np.concatenate((inc_head,np.full(len(inc_head),-1,dtype=np.int64)))
+                    cell_next=np.concatenate((cell_next,np.full(len(cell_next),-1,dtype=np.int64)))
+                c=n_points
+                points[c]=C
+                for i in range(NEW_NODE_HALVINGS):
+                    if not edges_cross(points,a,b,c,r,axes[side_plane],segments,e_slot,e_seq,e_next,s_nodes,s_seq,s_alive):
+                        break
+                    points[c]=towards+(points[c]-towards)*0.5
+                n_points+=1
+                key=cell_key(points[c],r)
+                if key in cells:
+                    cell_next[c]=cells[key]
+                cells[key]=c
+
+            else:
+                ####    Sides of the nearest node sharing a node with the current side    ####
+                near=incident_sides(c,s_seq,inc_head,inc_next)
+                n_shared=0
+                shared_a=False
+                for near_slot in near:
+                    near_a=s_nodes[near_slot,0]
+                    near_b=s_nodes[near_slot,1]
+                    if near_a==a or near_b==a:
+                        n_shared+=1
+                        remove[n_shared]=near_slot
+                        shared_a=True
+                    elif near_a==b or near_b==b:
+                        n_shared+=1
+                        remove[n_shared]=near_slot
+                    if n_shared==2:    #   a third would leave the Python engine stuck on the side
+                        break
+
+                remove[0]=slot
+                n_remove=1+n_shared
+                if n_shared==0:
+                    #   Case 2:
+                    new_sides[0,0],new_sides[0,1]=c,b
+                    new_sides[1,0],new_sides[1,1]=a,c
+                    n_new=2
+                elif n_shared==1:
+                    #   Case 3:
+                    if shared_a:
+                        new_sides[0,0],new_sides[0,1]=c,b
+                    else:
+                        new_sides[0,0],new_sides[0,1]=a,c
+                    n_new=1
+                for i in range(n_new):
+                    new_orientation[i]=side_orientation
+                    new_plane[i]=side_plane
+
+            if n_triangles==len(triangles):
+                triangles=grow(triangles)
+                planes=grow(planes)
+            triangles[n_triangles,0]=a
+            triangles[n_triangles,1]=b
+            triangles[n_triangles,2]=c
+            planes[n_triangles]=side_plane
+            n_triangles+=1
+
+        ####    Front update    ####
+        for i in range(n_remove):
+            rem=remove[i]
+            s_alive[rem]=False
+            free[n_free]=rem
+            n_free+=1
+            for end in range(2):
+                e=2*rem+end
+                node=s_nodes[rem,end]
+                if inc_prev[e]>=0:
+                    inc_next[inc_prev[e]]=inc_next[e]
+                else:
+                    inc_head[node]=inc_next[e]
+                if inc_next[e]>=0:
+                    inc_prev[inc_next[e]]=inc_prev[e]
+                inc_next[e]=-1
+                inc_prev[e]=-1
+
+        for i in range(n_new):
+            if pending:
+                side_a,side_b=side_nodes[i,0],side_nodes[i,1]
+                side_orientation=orientation[i]
+                side_plane=plane[i]
+                new_layer=layer[i]
+            else:
+                side_a,side_b=new_sides[i,0],new_sides[i,1]
+                side_orientation=new_orientation[i]
+                side_plane=new_plane[i]
+
+            if n_free>0:
+                n_free-=1
+                new=free[n_free]
+            else:
+                if n_slots==len(s_alive):
+                    s_nodes=grow(s_nodes)
+                    s_orientation=grow(s_orientation)
+                    s_plane=grow(s_plane)
+                    s_seq=grow(s_seq)
+                    s_layer=grow(s_layer)
+                    s_alive=grow(s_alive)
+                    free=grow(free)
+                    inc_next=np.concatenate((inc_next,np.full(len(inc_next),-1,dtype=np.int64)))
+                    inc_prev=np.concatenate((inc_prev,np.full(len(inc_prev),-1,dtype=np.int64)))
+                new=n_slots
+                n_slots+=1
+
+            s_nodes[new,0]=side_a
+            s_nodes[new,1]=side_b
+            s_orientation[new]=side_orientation
+            s_plane[new]=side_plane
+            s_seq[new]=count
+            s_layer[new]=new_layer
+            s_alive[new]=True
+
+            if select==1:
+                h_key=vector_norm(points[side_b]-points[side_a])
+            elif select==2:
+                h_key=float(new_layer)
+            else:
+                h_key=0.
+            if n_heap==len(h_keys):
+                h_keys=grow(h_keys)
+                h_seqs=grow(h_seqs)
+                h_slots=grow(h_slots)
+            n_heap=heap_push(h_keys,h_seqs,h_slots,n_heap,h_key,count,new)
+            count+=1
+
+            for end in range(2):
+                e=2*new+end
+                node=s_nodes[new,end]
+                inc_next[e]=inc_head[node]
+                if inc_head[node]>=0:
+                    inc_prev[inc_head[node]]=e
+                inc_head[node]=e
+
+            lo=np.floor(np.minimum(points[side_a],points[side_b])/r)
+            hi=np.floor(np.maximum(points[side_a],points[side_b])/r)
+            for i in range(int(lo[0]),int(hi[0])+1):
+                for j in range(int(lo[1]),int(hi[1])+1):
+                    for k in range(int(lo[2]),int(hi[2])+1):
+                        key=((i+(1<<20))*(1<<21)+j+(1<<20))*(1<<21)+k+(1<<20)
+                        if n_entries==len(e_slot):
+                            e_slot=grow(e_slot)
+                            e_seq=grow(e_seq)
+                            e_next=grow(e_next)
+                        e_slot[n_entries]=new
+                        e_seq[n_entries]=s_seq[new]
+                        e_next[n_entries]=segments[key] if key in segments else -1
+                        segments[key]=n_entries
+                        n_entries+=1
+
+        pending=False
+
+    return points[:n_points],triangles[:n_triangles],planes[:n_triangles]
 
 class Mesh():
-    def __init__(self,spacing:float,front:Front,debug:bool=False)->None:
+    def __init__(self,spacing:float,front:Front,debug:bool=False,select=None,engine:str='python',domains:int=None,workers:int=None,profile:bool=True)->None:
+        """
+        front: Front or list[Front]; A list, from init_front(per_face=True), meshes each face on its own in
+            parallel with advancing_front_faces.
+        select: str or callable, optional; Side selection strategy, see Front.select. Default keeps the front's.
+            Only the named strategies with domains or a list of fronts.
+        engine: str, optional; 'python' (advancing_front) or 'numba' (advancing_front_compiled, same panels).
+        domains: int, optional; Split a front on one plane into up to this many subdomains, meshed in
+            parallel by advancing_front_parallel. The panels differ from a serial run near the interfaces.
+        workers: int, optional; Processes for the subdomains or faces, default one per CPU.
+        profile: bool, optional; Profile the run and write the stats to profile.txt in the working directory.
+
+        The mesh is kept as nodes (N,3), triangles (M,3) int32 node ids, planes (M,) int32 row in normals
+        of each panel and normals (F,3); panels gives Panel objects on demand.
+        """
         self.front=front
+        fronts=front if isinstance(front,list) else [front]
+        if select is not None:
+            for front_ in fronts:
+                front_.select(select)
+        if (isinstance(front,list) or (domains is not None and domains>1)) and not isinstance(fronts[0].selection,str):
+            #   the strategy is pickled into the worker processes, which a callable key may not survive
+            raise ValueError(f"Parallel meshing needs a named selection strategy: {', '.join(SELECTION)}.")
+
+        if profile:
+            profiler.enable()
+
+        if engine not in ('python','numba'):
+            raise ValueError(f"Unknown engine '{engine}', use 'python' or 'numba'.")
+        if isinstance(front,list):
+            if domains is not None and domains>1:
+                raise ValueError("domains splits a single front, not per face fronts.")
+            self.nodes,self.triangles,self.planes,self.normals=self.advancing_front_faces(spacing,engine,workers)
+        elif domains is not None and domains>1:
+            self.nodes,self.triangles,self.planes,self.normals=self.advancing_front_parallel(spacing,domains,engine,workers)
+        elif engine=='python':
+            self.nodes,self.triangles,self.planes,self.normals=self.advancing_front(spacing,debug)
+        else:
+            self.nodes,self.triangles,self.planes,self.normals=self.advancing_front_compiled(spacing)
 
-        profiler.enable()
+        if profile:
+            profiler.disable()
+            s=io.StringIO()
+            stats=pstats.Stats(profiler,stream=s)
+            stats.strip_dirs()
+            stats.sort_stats('cumtime')
+            stats.print_stats()
 
-        self.panels=self.advancing_front(spacing,debug)
+            with open('profile.txt','w+') as f:
+                f.write(s.getvalue())
 
-        profiler.disable()
-        s=io.StringIO()
-        stats=pstats.Stats(profiler,stream=s)
-        stats.strip_dirs()
-        stats.sort_stats('cumtime')
-        stats.print_stats()
+        return None
 
-        with open('profile.txt','w+') as f:
-            f.write(s.getvalue())
+    @property
+    def panels(self)->list:
+        """Panel objects of the triangles, built on access."""
+        return [Panel(self.normals[plane],*self.nodes[triangle]) for triangle,plane in zip(self.triangles,self.planes)]
 
-        return None
+    @staticmethod
+    def expected_panels(front:Front,spacing:float)->int:
+        """Number of panels to preallocate for: the front's area over that of an equilateral panel."""
+        return int(front.area()/(np.sqrt(3)/4*spacing**2))
 
     @staticmethod
-    @nb.jit(nopython=True)
-    def find_near_nodes(centre_node:np.ndarray,nodes:np.ndarray,r:float)->list:
+    @nb.jit(nopython=True,cache=True)
+    def find_near_nodes(centre_node:np.ndarray,nodes:np.ndarray,r:float)->tuple:
         """
         Finds nodes in radius around centre node.
 
@@ -142,154 +1135,114 @@ class Mesh():
             r: {float} -- Radius of search area.
 
         Returns:
-            near_nodes: {np.ndarray} -- List of nodes within search area.
+            index: {np.ndarray} -- Indices into nodes of the nodes within search area.
+            distance: {np.ndarray} -- Their distances from centre node.
         """
-        near_nodes=[]
-        for node in nodes:
-            distance=np.linalg.norm(node-centre_node)
-            if distance<=r:
-                near_nodes.append((node,distance))
-        
-        return near_nodes
-    
+        index=np.empty(len(nodes),dtype=np.int64)
+        distance=np.empty(len(nodes))
+        n=0
+        for i in range(len(nodes)):
+            d=np.linalg.norm(nodes[i]-centre_node)
+            if d<=r:
+                index[n]=i
+                distance[n]=d
+                n+=1
+
+        return index[:n],distance[:n]
+
     @staticmethod
-    @nb.jit(nopython=True)
-    def find_connected_sides(node:np.array,side_nodes:np.ndarray)->list:
+    def side_direction(side:Front_side,nodes:np.ndarray)->tuple:
         """
-        Finds sides in the front attached to a node.
+        Calculates which side of a line points are.
+
+        Attributes:
+            side: {Front_side} -- Dividing line to check which side the points are on.
+            nodes: {np.ndarray} -- (k,3) points to work out which side of the line they are on.
 
-        Arguments:
-            node: {np.array} -- Node to find connected sides.
-            sides: {np.ndarray} -- List of sides to search from.
-        
         Returns:
-            near_sides: {list} -- List of sides connected to node.
+            d_nodes: {np.ndarray} -- Signed distance measure between each node and line.
+            d_side_in: {float} -- Used to compare sign with d_nodes. If both have the same sign, both are on the same side.
         """
-        near_side_is=[]
-        for i,side in enumerate(side_nodes):
-            A=side[0]
-            B=side[1]
+        A,B,y=side.A,side.B,side.y
+        d_side_in=(A[0]+1*y[0]-A[0])*(B[1]-A[1])-(A[1]+1*y[1]-A[1])*(B[0]-A[0])
+        d_nodes=(nodes[:,0]-A[0])*(B[1]-A[1])-(nodes[:,1]-A[1])*(B[0]-A[0])
 
-            if np.array_equal(A,node) or np.array_equal(B,node):
-                near_side_is.append(i)
-        
-        return near_side_is
+        return d_nodes,d_side_in
 
-    def filter_near_nodes(self,current_side:Front_side,near_nodes:list):
+    @staticmethod
+    def angle_cosines(side:Front_side,nodes:np.ndarray)->tuple:
         """
-        Finds most constraining left and right sides connected to the current side and works out if nodes are within these bounds,
+        Cosines of the angles at A and B between the side and lines to the nodes, -1 (180 degrees) for a node on
+        A or B. The constraining sides are measured the same way through their far nodes, so a node on a
+        constraint gives exactly the constraint's cosine.
 
         Attributes:
-            current_side: {Front_side} -- Current side in the front to consider.
-            near_nodes: {list} -- List of nodes to be put through the filter.
+            side: {Front_side} -- Side the angles are measured from.
+            nodes: {np.ndarray} -- (k,3) points.
 
         Returns:
-            near_nodes_filetered: {list} -- List of nodes within the bounds.
-            L_constraint: {Front_side,float} -- Left constraining side and angle (side,angle).
-            R_constraint: {Front_side,float} -- Right constraining side and angle (side,angle).
+            cos_A: {np.ndarray} -- Cosine of the angle between node->A and the side.
+            cos_B: {np.ndarray} -- Cosine of the angle between B->node and the side.
         """
+        k=len(nodes)
+        D=np.concatenate([side.A-nodes,nodes-side.B])   #   node->A, then B->node
+        DD=D*D
+        Dv=D*side.vector
+        mod=np.sqrt(DD[:,0]+DD[:,1]+DD[:,2])*side.length
+        cos=np.divide(Dv[:,0]+Dv[:,1]+Dv[:,2],mod,out=np.full(2*k,-1.),where=mod!=0)
+        cos_A,cos_B=cos[:k],cos[k:]
 
-        def check_side_direction(side:Front_side,node:np.ndarray)->tuple:
-            """
-            Calculates which side of a line a point is.
-
-            Attributes:
-                side: {Front_side} -- Dividing line to check which side the point is on.
-                node: {np.ndarray} -- Point to work out which side of the line it is on.
-
-            Returns:
-                d_node: {float} -- Min. distance between node and line.
-                d_side_in: {float} -- Used to compare sign with d_node. If both have the same sign, both are on the same side.
-            """
-            assert type(side)==Front_side
-            assert type(node)==np.ndarray
-
-            norm_side=side.y
-            x_side_A,y_side_A,z_side_A=side.A.T
-            x_side_B,y_side_B,z_side_B=side.B.T
-            d_side_in=(x_side_A+1*norm_side[0]-x_side_A)*(y_side_B-y_side_A)-(y_side_A+1*norm_side[1]-y_side_A)*(x_side_B-x_side_A)
-
-            x_node,y_node,z_node=node.T
-            d_node=(x_node-x_side_A)*(y_side_B-y_side_A)-(y_node-y_side_A)*(x_side_B-x_side_A)
-
-            return d_node,d_side_in
+        return cos_A,cos_B
 
+    @staticmethod
+    def filter_near_nodes(front:Front,current_side:Front_side,nodes:np.ndarray,distances:np.ndarray)->tuple:
+        """
+        Finds most constraining left and right sides connected to the current side and works out which nodes are within these bounds.
+        Angles are compared through their cosines, a node at angle theta from the side is within a constraint at angle phi if
+        cos(theta)<=cos(phi).
 
-        front_side_nodes=np.array([(x.A,x.B) for x in self.front.sides])
-        adjacent_side_is=[
-            self.find_connected_sides(current_side.A,front_side_nodes),
-            self.find_connected_sides(current_side.B,front_side_nodes)
-        ]
-        adjacent_side_is=[_ for xs in adjacent_side_is for _ in xs if _!=current_side]
-
-        adjacent_sides=[self.front.sides[i] for i in adjacent_side_is]
-        
-        #   Remove adjacent sides with nodes below current side from consideration.
-        adjacent_sides_in={}
-        for adj_side in adjacent_sides:
-            if list(adj_side.A)==list(current_side.A):
-                connect="A"
-                node=adj_side.A
-            elif list(adj_side.A)==list(current_side.B):
-                connect="B"
-                node=adj_side.B
-            elif list(adj_side.B)==list(current_side.A):
-                connect="A"
-                node=adj_side.A
-            elif list(adj_side.B)==list(current_side.B):
-                connect="B"
-                node=adj_side.B
-
-            d_node,d_current_in=check_side_direction(current_side,node)
-            
-            if d_node*d_current_in>0:   #   if above current side
-                adjacent_sides_in[adj_side]=connect
-        
-        #   Calculates constraining sides & angels
-        L_angle=0
-        R_angle=0
-        L_constraint=(None,0)
-        R_constraint=(None,0)
-        for adj_side,connect in adjacent_sides_in.items():
-            angle=np.rad2deg(np.arccos(np.dot(adj_side.vector,current_side.vector)/(adj_side.length*current_side.length)))
-            
-            if connect=="A":
-                if angle>L_angle:
-                    L_angle=angle
-                    L_constraint=(adj_side,angle)
-            else:
-                if angle>R_angle:
-                    R_angle=angle
-                    R_constraint=(adj_side,angle)
-        
-        #   Filter near nodes by constraints
-        near_nodes_filtered=[]
-        for node,dist in near_nodes:
-
-            node2A=current_side.A-node
-            B2node=node-current_side.B
+        Attributes:
+            front: {Front} -- Front the current side is in.
+            current_side: {Front_side} -- Current side in the front to consider.
+            nodes: {np.ndarray} -- (k,3) coordinates of the nodes to be put through the filter.
+            distances: {np.ndarray} -- (k,) their distances from the ideal node.
 
-            node2A_mod=np.linalg.norm(node2A)
-            B2node_mod=np.linalg.norm(B2node)
-            
-            if node2A_mod!=0 and current_side.length!=0:
-                Adot=np.dot(node2A,current_side.vector)/(node2A_mod*current_side.length)
-                angle_A=np.rad2deg(np.arccos(Adot))
-            else:
-                angle_A=180
-            if B2node_mod!=0 and current_side.length!=0:
-                Bdot=np.dot(B2node,current_side.vector)/(B2node_mod*current_side.length)
-                angle_B=np.rad2deg(np.arccos(Bdot))
+        Returns:
+            survivors: {np.ndarray} -- Indices into nodes of the nodes within the bounds.
+            distances: {np.ndarray} -- Their distances.
+            L_constraint: {int,float} -- Slot of the left constraining side and cosine of its angle to the current side, (None,1) if none.
+            R_constraint: {int,float} -- Slot of the right constraining side and cosine of its angle to the current side, (None,1) if none.
+        """
+        a,b=current_side.ids
+        slots=[slot for slot in dict.fromkeys(front.sides_at(a)+front.sides_at(b)) if slot!=current_side.slot]
+
+        #   Adjacent sides connect at A or B, their other node goes through the same tests as the candidates.
+        ends=front.side_nodes[slots].reshape(-1,2)
+        connect_A=(ends[:,0]==a)|((ends[:,0]!=b)&(ends[:,1]==a))
+        adjacent_nodes=front.points[np.where(connect_A,ends[:,0],ends[:,1])]
+        m=len(slots)
+
+        tested=np.concatenate([adjacent_nodes,nodes])
+        cos_A,cos_B=Mesh.angle_cosines(current_side,tested)
+        d_nodes,d_current_in=Mesh.side_direction(current_side,tested)
+        above=d_nodes*d_current_in>0
+
+        #   Constraining sides: largest angle (smallest cosine) of the adjacent sides above the current side, first on ties.
+        constraints=[]
+        for connect,cos in ((connect_A,cos_A[:m]),(~connect_A,cos_B[:m])):
+            candidates=np.flatnonzero(above[:m]&connect&(cos<1))
+            if len(candidates):
+                i=candidates[np.argmin(cos[candidates])]
+                constraints.append((slots[i],cos[i]))
             else:
-                angle_B=180
+                constraints.append((None,1.))
+        L_constraint,R_constraint=constraints
 
-            if angle_A>=L_angle and angle_B>=R_angle:   #   if within angle constraints
-                d_node,d_current_in=check_side_direction(current_side,node)
-
-                if d_node*d_current_in>0:   #   if above current side
-                    near_nodes_filtered.append((node,dist))
+        #   Filter near nodes by constraints
+        inside=(cos_A[m:]<=L_constraint[1])&(cos_B[m:]<=R_constraint[1])&above[m:]     #   within angle constraints and above current side
+        survivors=np.flatnonzero(inside)
 
-        return near_nodes_filtered,(L_constraint,R_constraint)
+        return survivors,distances[survivors],(L_constraint,R_constraint)
 
     def advancing_front(self,spacing:float,debug:bool):
         """
@@ -300,21 +1253,33 @@ class Mesh():
             debug: {bool} -- Enable debug mode.
 
         Returns:
-            panels: {list} -- List of generated tri panels.
+            nodes: {np.ndarray} -- (N,3) node coordinates, boundary nodes first.
+            triangles: {np.ndarray} -- (M,3) int32 node ids A,B,C of the panels, in the order generated.
+            planes: {np.ndarray} -- (M,) int32 row in normals of each panel.
+            normals: {np.ndarray} -- (F,3) plane normals.
 
         """
-        #fig,ax=plt.subplots()
-        dt=[]
-        
+        front=self.front
+
+        n_panels=self.expected_panels(front,spacing)
+        n_nodes=front.n_points+n_panels//2+1    #   about one node per two panels
+        if len(front.points)<n_nodes:
+            front.points=np.concatenate([front.points,np.zeros([n_nodes-len(front.points),3])])
+        normals,_=front.planes()
+        plane_of={tuple(normal):i for i,normal in enumerate(normals.tolist())}
+        axes=[plane_axes(normal) for normal in normals]
+        triangles=np.zeros([max(n_panels,16),3],dtype=np.int32)
+        planes=np.zeros(max(n_panels,16),dtype=np.int32)
 
-        panels=[]
         i=0
         while True:
-            t0=time()
-            if self.front.sides==[]:
+            slot=front.next_side()
+            if slot is None:
                 break
 
-            side=self.front(0)
+            side=front.side(slot)
+            a,b=side.ids
+            properties=(side.orientation,side.vect_out_plane)
 
             #   Find ideal node position.
             x=side.x
@@ -327,18 +1292,24 @@ class Mesh():
             C_ideal=A+x*dx/2+y*dy
 
             r=1*spacing   #   needs a proper method
-            front_nodes=self.front.nodes
-            near_nodes=self.find_near_nodes(
+            front_nodes=front.nodes_near(C_ideal,r)
+            index,distances=self.find_near_nodes(
                 centre_node=C_ideal,
-                nodes=front_nodes,
+                nodes=front.points[front_nodes],
                 r=r,
             )
-            near_nodes_=[]
-            for node in near_nodes:
-                if list(node)!=list(A) and list(node)!=list(B):
-                    near_nodes_.append(node)
+            near_ids=front_nodes[index]
+            keep=(near_ids!=a)&(near_ids!=b)
+            near_ids,distances=near_ids[keep],distances[keep]
             
-            near_nodes_filtered,(L_constraint,R_constraint)=self.filter_near_nodes(side,near_nodes_)
+            survivors,distances,(L_constraint,R_constraint)=self.filter_near_nodes(front,side,front.points[near_ids],distances)
+            near_ids=near_ids[survivors]
+
+            #   Drop nodes whose new sides would cross the front.
+            side_axes=axes[plane_of[tuple(side.vect_out_plane.tolist())]]
+            if len(near_ids):
+                crossing=front.edges_cross(a,b,near_ids,r,side_axes)
+                near_ids,distances=near_ids[~crossing],distances[~crossing]
 
             #   Checks to determine type of close node:
             #       1a. No close nodes, generate point in ideal position.
@@ -346,189 +1317,460 @@ class Mesh():
             #       2. Connect to a node with no adjascent sides.
             #       3. Connect to 1 adjascent side.
             #       4. Connect to 2 adjascent sides (close a triangle).
-            if near_nodes_filtered==[]:
+            if len(near_ids)==0:
                 node=C_ideal
                 
-                node2A=A-node
-                B2node=node-B
-
-                node2A_mod=np.linalg.norm(node2A)
-                B2node_mod=np.linalg.norm(B2node)
-
-                angle_A=np.rad2deg(np.arccos(np.dot(node2A,side.vector)/(node2A_mod*side.length)))
-                angle_B=np.rad2deg(np.arccos(np.dot(B2node,side.vector)/(B2node_mod*side.length)))
+                (cos_A,),(cos_B,)=self.angle_cosines(side,node[None])
+                inside_A=cos_A<=L_constraint[1]
+                inside_B=cos_B<=R_constraint[1]
                 
-                if angle_A>=L_constraint[1] and angle_B>=R_constraint[1]:   #   if within angle constraints
+                if inside_A and inside_B:   #   if within angle constraints
                     #   Case 1a:
-                    C=C_ideal
-
-                    new_sides=[
-                        Front_side(C,B,orientation=side.orientation,vect_out_plane=side.vect_out_plane),
-                        Front_side(A,C,orientation=side.orientation,vect_out_plane=side.vect_out_plane)
-                    ]
+                    c=front.add_node(C_ideal)
+                    towards=A+x*dx/2
 
-                    #   update front and panels
-                    self.front.update(add=new_sides,remove=[side])
-                    panels.append(Panel(side.vect_out_plane,A,B,C))
+                    remove=[slot]
+                    new_sides=[(c,b)+properties,(a,c)+properties]
 
                 else:
                     #   Case 1b:
                     h=np.sqrt((dx/2)**2+(dy)**2)
                     
-                    if angle_A<L_constraint[1]:
+                    if not inside_A:
                         #crosses left constraint
-                        theta=180-L_constraint[1]
+                        L_slot=L_constraint[0]
+                        theta=180-np.rad2deg(arccos(L_constraint[1]))
                         dx_=h*np.cos(np.deg2rad(theta))
                         dy_=h*np.sin(np.deg2rad(theta))
-                        C=A+dx_*x+dy_*y
-
-                        remove=[L_constraint[0],side]
-                        split=Front_side(L_constraint[0].A,
-                            C,
-                            orientation=L_constraint[0].orientation,
-                            vect_out_plane=L_constraint[0].vect_out_plane
-                        )
+                        c=front.add_node(A+dx_*x+dy_*y)
+                        towards=A
 
+                        remove=[L_slot,slot]
                         new_sides=[
-                            Front_side(C,B,orientation=side.orientation,vect_out_plane=side.vect_out_plane),
-                            split
+                            (c,b)+properties,
+                            (int(front.side_nodes[L_slot,0]),c,bool(front.orientation[L_slot]),front.normal[L_slot].copy())
                         ]
                     
-                    elif angle_B<R_constraint[1]:
+                    else:
                         #crosses right constraint
-                        theta=180-R_constraint[1]
+                        R_slot=R_constraint[0]
+                        theta=180-np.rad2deg(arccos(R_constraint[1]))
                         dx_=dx-h*np.cos(np.deg2rad(theta))
                         dy_=h*np.sin(np.deg2rad(theta))
-                        C=A+dx_*x+dy_*y
-
-                        remove=[R_constraint[0],side]
-                        split=Front_side(C,
-                            R_constraint[0].B,
-                            orientation=R_constraint[0].orientation,
-                            vect_out_plane=R_constraint[0].vect_out_plane
-                        )
+                        c=front.add_node(A+dx_*x+dy_*y)
+                        towards=B
 
+                        remove=[R_slot,slot]
                         new_sides=[
-                            Front_side(A,C,orientation=side.orientation,vect_out_plane=side.vect_out_plane),
-                            split
+                            (a,c)+properties,
+                            (c,int(front.side_nodes[R_slot,1]),bool(front.orientation[R_slot]),front.normal[R_slot].copy())
                         ]
-                    
-                    else:
-                        print('wot')
 
-                    #   update front and panels
-                    self.front.update(add=new_sides,remove=remove)
-                    panels.append(Panel(side.vect_out_plane,A,B,C))
+                #   Pull the new node in while its sides would cross the front, towards the side's
+                #   midpoint (1a) or along the constraint (1b), so the hanging node stays on it.
+                for _ in range(NEW_NODE_HALVINGS):
+                    if not front.edges_cross(a,b,np.array([c]),r,side_axes)[0]:
+                        break
+                    front.points[c]=towards+(front.points[c]-towards)*0.5
+
+                #   update front and panels
+                front.update(add=new_sides,remove=remove)
 
             else:
                 ####   Check if near nodes cross adjacent sides.    ####
                 
-                min_dist=1e99
-                for node,dist in near_nodes_filtered:
-                    if dist<min_dist:
-                        min_dist=dist
-                        nearest_node=node
+                c=int(near_ids[np.argmin(distances)])  #   first of the nearest
 
-                """
                 ####    Checks if nearest node has sides connecting to current side    ####
                 shared_nodes={}
-                if L_constraint!=None:
-                    shared_nodes[L_constraint]=B
-                if R_constraint!=None:
-                    shared_nodes[R_constraint]=A
-                """
-                #end for
-                
-                shared_nodes={}
-
-                front_side_nodes=np.array([(x.A,x.B) for x in self.front.sides])
-                near_side_is=self.find_connected_sides(nearest_node,front_side_nodes)
-                near_sides=[self.front.sides[i] for i in near_side_is]
-                
-                for near_side in near_sides:
-                    if list(A) in (list(near_side.A),list(near_side.B)):
-                        shared_nodes[near_side]=B
-                    elif list(B) in (list(near_side.A),list(near_side.B)):
-                        shared_nodes[near_side]=A
+                for near_slot in front.sides_at(c):
+                    near_ids=front.side_nodes[near_slot]
+                    if a in near_ids:
+                        shared_nodes[near_slot]=b
+                    elif b in near_ids:
+                        shared_nodes[near_slot]=a
+                    if len(shared_nodes)==2:    #   as advance_front, a third would leave the side in the front
+                        break
                 
                 ####    Checks cases 2,3,4    ####
 
-                C=nearest_node
-                if len(shared_nodes.items())==0:
+                if len(shared_nodes)==0:
                     ##   Case 2:
-                    new_sides=[
-                        Front_side(C,B,orientation=side.orientation,vect_out_plane=side.vect_out_plane),
-                        Front_side(A,C,orientation=side.orientation,vect_out_plane=side.vect_out_plane)
-                    ]
-
-                    #   update front and panels
-                    self.front.update(add=new_sides,remove=[side])
-                    panels.append(Panel(side.vect_out_plane,A,B,C))
+                    front.update(add=[(c,b)+properties,(a,c)+properties],remove=[slot])
 
-                elif len(shared_nodes.items())==1:
+                elif len(shared_nodes)==1:
                     ##   Case 3:
-                    side_node=list(shared_nodes.values())[0]
-                    if list(side_node)==list(A):
-                        new_sides=[
-                            Front_side(
-                                side_node,C,orientation=side.orientation,vect_out_plane=side.vect_out_plane
-                            )
-                        ]
-                    elif list(side_node)==list(B):
-                        new_sides=[
-                            Front_side(
-                                C,side_node,orientation=side.orientation,vect_out_plane=side.vect_out_plane
-                            )
-                        ]
+                    (near_slot,side_node),=shared_nodes.items()
+                    if side_node==a:
+                        new_sides=[(a,c)+properties]
+                    elif side_node==b:
+                        new_sides=[(c,b)+properties]
 
-                    self.front.update(add=new_sides,remove=[side,list(shared_nodes.keys())[0]])
-                    panels.append(Panel(side.vect_out_plane,A,B,C))
+                    front.update(add=new_sides,remove=[slot,near_slot])
 
-                elif len(shared_nodes.items())==2:
+                elif len(shared_nodes)==2:
                     ##   Case 4:
-                    side1,side2=list(shared_nodes.keys())
+                    front.update(add=(),remove=[slot]+list(shared_nodes))
 
-                    self.front.update(add=(),remove=[side,side1,side2])
-                    panels.append(Panel(side.vect_out_plane,A,B,C))
+            if i==len(triangles):
+                triangles=np.concatenate([triangles,np.zeros_like(triangles)])
+                planes=np.concatenate([planes,np.zeros_like(planes)])
+            triangles[i]=a,b,c
+            planes[i]=plane_of[tuple(side.vect_out_plane.tolist())]
             
             if debug==True:
+                from plot_tools import Plot_sides
+
                 if i>320:
                     if (i/1).is_integer()==True:
-                        Plot_sides(np.array(self.front.sides))
-            
-            #Plot_panels([panels[-1]],ax=ax)
-            #if i==1:
-            #    sleep(0.1)
-            #dt.append(time()-t0)
-
-
-            #Plot_sides(new_sides,ax=ax,nodes=False)
-            #plt.pause(0.001)
+                        Plot_sides(front.sides)
 
             i+=1
         #end while
-        #system('cls')
-        #with open('t.txt','w') as f:
-        #    f.write("\n".join([str(t) for t in dt]))
         
-        #plt.show()
-        return panels
+        return front.points[:front.n_points].copy(),triangles[:i],planes[:i],normals
 
-        
-def read(file:str,csv=False)->list:
+
+    def advancing_front_compiled(self,spacing:float)->tuple:
+        """
+        Advancing front mesh generation with the compiled kernel advance_front. Gives the same panels as
+        advancing_front; the selection strategy must be one of SELECTION_CODES and debug plots are not
+        available.
+
+        Arguments:
+            spacing: {float} -- Target spacing between nodes.
+
+        Returns:
+            nodes, triangles, planes, normals: as advancing_front.
+        """
+        front=self.front
+        if not isinstance(front.selection,str):
+            raise ValueError(f"The numba engine needs a named selection strategy: {', '.join(SELECTION_CODES)}.")
+
+        slots=np.flatnonzero(front.alive[:front.n_slots])
+        slots=slots[np.argsort(front.seq[slots],kind='stable')]
+        normals,plane=front.planes()
+        nodes,triangles,planes=advance_front(
+            front.points,
+            front.n_points,
+            front.side_nodes[slots],
+            front.orientation[slots],
+            plane[slots],
+            normals,
+            front.layer[slots],
+            float(spacing),
+            SELECTION_CODES[front.selection],
+            self.expected_panels(front,spacing),
+        )
+
+        #   The kernel consumed the front.
+        front.update(add=(),remove=slots.tolist())
+        front.points=nodes.copy()
+        front.n_points=len(nodes)
+
+        return nodes,triangles,planes,normals
+
+    def advancing_front_parallel(self,spacing:float,domains:int,engine:str,workers:int=None)->tuple:
+        """
+        Domain decomposition: splits the front into subdomains with split_front, meshes them in a process
+        pool and stitches the results on the shared boundary and interface nodes. Each interface side is
+        a panel side in both subdomains next to it, so the mesh is conforming without merging nodes.
+
+        Arguments:
+            spacing: {float} -- Target spacing between nodes.
+            domains: {int} -- Largest number of subdomains.
+            engine: {str} -- Engine run on each subdomain, 'python' or 'numba'.
+            workers: {int} -- Processes, default one per CPU.
+
+        Returns:
+            nodes, triangles, planes, normals: as advancing_front.
+        """
+        front=self.front
+        points,subdomains,normal=split_front(front,spacing,domains)
+        nodes,triangles,planes,normals=mesh_domains(points,[(sides,normal) for sides in subdomains],spacing,
+            front.selection,engine,workers)
+
+        #   The subdomains consumed the front.
+        front.update(add=(),remove=np.flatnonzero(front.alive[:front.n_slots]).tolist())
+        front.points=nodes.copy()
+        front.n_points=len(nodes)
+
+        return nodes,triangles,planes,normals
+
+    def advancing_front_faces(self,spacing:float,engine:str,workers:int=None)->tuple:
+        """
+        Meshes the fronts of init_front(per_face=True) independently with mesh_domains, so each face only
+        searches its own nodes, and merges them on the boundary node ids they share.
+
+        Arguments:
+            spacing: {float} -- Target spacing between nodes.
+            engine: {str} -- Engine run on each face, 'python' or 'numba'.
+            workers: {int} -- Processes, default one per CPU.
+
+        Returns:
+            nodes, triangles, planes, normals: as advancing_front, boundary nodes first with their ids.
+        """
+        fronts=self.front
+        boundary=fronts[0].boundary
+        if boundary is None or any(front.boundary is not boundary for front in fronts):
+            raise ValueError("Per face fronts must share one boundary cache, see init_front(per_face=True).")
+
+        faces=[]
+        for front in fronts:
+            normals,_=front.planes()
+            if len(normals)!=1:
+                raise ValueError(f"A face front spans {len(normals)} planes.")
+            faces.append((front.oriented_sides(),normals[0]))
+        nodes,triangles,planes,normals=mesh_domains(boundary.nodes,faces,spacing,fronts[0].selection,engine,workers)
+
+        #   The faces consumed the fronts.
+        for front in fronts:
+            front.update(add=(),remove=np.flatnonzero(front.alive[:front.n_slots]).tolist())
+
+        return nodes,triangles,planes,normals
+
+def split_front(front:Front,spacing:float,domains:int)->tuple:
+    """
+    Splits a front on one plane into up to `domains` subdomains of about equal area, for
+    Mesh.advancing_front_parallel. Cuts run across the longest in plane extent of the front. Where a cut
+    passes through the domain, the interface runs between the nearer ends of the two sides it crosses and
+    is discretised at spacing. Cuts closer than 4*spacing to each other or to the ends are dropped, so are
+    interfaces shorter than spacing or crossing a side; the subdomains either side then stay joined.
+
+    Parameters:
+    -----------
+    front: Front; Front on one plane.
+    spacing: float; Target spacing between nodes.
+    domains: int; Largest number of subdomains.
+
+    Returns:
+    --------
+    points: np.ndarray; Front nodes followed by the interface nodes.
+    subdomains: list[np.ndarray]; (k,2) node ids of the sides around each subdomain, outer loop first,
+        with the subdomain on the left of a->b about normal (orientation True).
+    normal: np.ndarray; Normal of the plane.
+    """
+    normals,_=front.planes()
+    if len(normals)!=1:
+        raise ValueError(f"Domain decomposition needs a front on one plane, this one spans {len(normals)}.")
+    normal=normals[0]
+    a,b=front.oriented_sides().T
+
+    #   In plane axes, u along the longest extent and (u,v,normal) right handed.
+    u,v=plane_axes(normal)
+    points=front.points[:front.n_points]
+    used=np.unique(np.concatenate([a,b]))
+    if np.ptp(points[used]@v)>np.ptp(points[used]@u):
+        u,v=v,-u
+    uv=points@np.array([u,v]).T
+    ua,va=uv[a].T
+    ub,vb=uv[b].T
+
+    def area_before(c:float)->float:
+        """Area of the domain where u<c: the integral of (u-c)dv along the sides clipped to u<=c."""
+        in_a=ua<c
+        in_b=ub<c
+        with np.errstate(divide='ignore',invalid='ignore'):
+            vc=va+(c-ua)/(ub-ua)*(vb-va)
+            uP,vP=np.where(in_a,ua,c),np.where(in_a,va,vc)
+            uQ,vQ=np.where(in_b,ub,c),np.where(in_b,vb,vc)
+            return float(np.sum(np.where(in_a|in_b,((uP+uQ)/2-c)*(vQ-vP),0.)))
+
+    u_min,u_max=uv[used,0].min(),uv[used,0].max()
+    total=area_before(u_max)
+    cuts=[]
+    for k in range(1,domains):
+        lo,hi=u_min,u_max
+        for _ in range(60):
+            mid=(lo+hi)/2
+            if area_before(mid)<k/domains*total:
+                lo=mid
+            else:
+                hi=mid
+        c=(lo+hi)/2
+        if c-(cuts[-1] if cuts else u_min)>=4*spacing and u_max-c>=4*spacing:
+            cuts.append(c)
+
+    def crosses(P:int,Q:int)->bool:
+        """Whether segment P-Q strictly crosses a side not ending on P or Q."""
+        p,q=uv[P],uv[Q]
+        A,B=uv[a],uv[b]
+        side_of=lambda o,s,t:(s[...,0]-o[...,0])*(t[...,1]-o[...,1])-(s[...,1]-o[...,1])*(t[...,0]-o[...,0])
+        other=(a!=P)&(a!=Q)&(b!=P)&(b!=Q)
+        return bool(np.any(other&(side_of(p,q,A)*side_of(p,q,B)<0)&(side_of(A,B,p)*side_of(A,B,q)<0)))
+
+    new=[]
+    half_a,half_b=[a],[b]
+    for c in cuts:
+        crossing=np.flatnonzero((ua<c)!=(ub<c))
+        vc=va[crossing]+(c-ua[crossing])/(ub[crossing]-ua[crossing])*(vb[crossing]-va[crossing])
+        crossing=crossing[np.argsort(vc,kind='stable')]
+        #   Along the cut the domain starts at a side heading +u and ends at the next, heading -u.
+        for s,t in zip(crossing[:-1],crossing[1:]):
+            if not (ub[s]>ua[s] and ub[t]<ua[t]):
+                continue
+            P=a[s] if abs(ua[s]-c)<=abs(ub[s]-c) else b[s]
+            Q=a[t] if abs(ua[t]-c)<=abs(ub[t]-c) else b[t]
+            length=np.linalg.norm(uv[Q]-uv[P])
+            if P==Q or length<spacing or crosses(P,Q):
+                continue
+            n=max(1,int(round(length/spacing)))
+            chain=[P]+list(range(len(points)+len(new),len(points)+len(new)+n-1))+[Q]
+            new.extend(points[P]+(points[Q]-points[P])*k/n for k in range(1,n))
+            half_a.append(np.array(chain[:-1]+chain[1:]))
+            half_b.append(np.array(chain[1:]+chain[:-1]))
+
+    points=np.concatenate([points,np.array(new).reshape(-1,3)])
+    uv=points@np.array([u,v]).T
+    half_a=np.concatenate(half_a)
+    half_b=np.concatenate(half_b)
+    direction=uv[half_b]-uv[half_a]
+    angle=np.arctan2(direction[:,1],direction[:,0])
+
+    #   Trace the faces of the side graph, each with the domain on its left: at every node take the
+    #   first side clockwise from the way back.
+    outgoing={}
+    for h,node in enumerate(half_a.tolist()):
+        outgoing.setdefault(node,[]).append(h)
+    following=np.empty(len(half_a),dtype=np.int64)
+    for h in range(len(half_a)):
+        out=outgoing[half_b[h]]
+        if len(out)==1:
+            following[h]=out[0]
+            continue
+        out=np.array(out)
+        turn=(np.arctan2(-direction[h,1],-direction[h,0])-angle[out])%(2*np.pi)
+        turn[half_b[out]==half_a[h]]=2*np.pi
+        following[h]=out[np.argmin(turn)]
+
+    loops=[]
+    seen=np.zeros(len(half_a),dtype=bool)
+    for h in range(len(half_a)):
+        loop=[]
+        while not seen[h]:
+            seen[h]=True
+            loop.append(h)
+            h=following[h]
+        if loop:
+            loops.append(np.array(loop))
+    areas=[0.5*float(np.sum(uv[half_a[x],0]*uv[half_b[x],1]-uv[half_b[x],0]*uv[half_a[x],1])) for x in loops]
+
+    #   Outer loops run anticlockwise, each hole goes to the smallest outer loop around it.
+    outer=[i for i,area in enumerate(areas) if area>0]
+    members={i:[i] for i in outer}
+    for i,area in enumerate(areas):
+        if area>0:
+            continue
+        x,y=uv[half_a[loops[i][0]]]
+        around=[]
+        for j in outer:
+            p,q=uv[half_a[loops[j]]],uv[half_b[loops[j]]]
+            with np.errstate(divide='ignore',invalid='ignore'):
+                hits=((p[:,1]>y)!=(q[:,1]>y))&(x<p[:,0]+(y-p[:,1])*(q[:,0]-p[:,0])/(q[:,1]-p[:,1]))
+            if np.count_nonzero(hits)%2:
+                around.append(j)
+        if not around:
+            raise ValueError("Front loop outside every outer loop, check the side orientations.")
+        members[min(around,key=lambda j:areas[j])].append(i)
+
+    subdomains=[]
+    for i in outer:
+        h=np.concatenate([loops[j] for j in members[i]])
+        subdomains.append(np.stack([half_a[h],half_b[h]],axis=1))
+
+    return points,subdomains,normal
+
+def mesh_domains(points:np.ndarray,domains:list,spacing:float,select,engine:str,workers:int=None)->tuple:
+    """
+    Meshes domains in a process pool and stitches the results on the node ids they share, for
+    Mesh.advancing_front_parallel and Mesh.advancing_front_faces. The largest domains (by area, so by
+    expected panels area/spacing^2) are submitted first, so a big one does not start last and hold up the
+    rest. Node numbering does not depend on the order they finish in.
+
+    Parameters:
+    -----------
+    points: np.ndarray; Node table the domain sides index.
+    domains: list[tuple]; (sides,normal) per domain, sides (k,2) with the domain on the left of a->b.
+    spacing, select, engine: As Mesh.
+    workers: int, optional; Processes, default one per CPU.
+
+    Returns:
+    --------
+    nodes, triangles, planes, normals: as Mesh.advancing_front, points first.
+    """
+    ids=[np.unique(sides) for sides,_ in domains]
+    areas=[0.5*float(np.cross(points[sides[:,0]],points[sides[:,1]]).sum(axis=0)@normal) for sides,normal in domains]
+    with ProcessPoolExecutor(workers) as executor:
+        futures={i:executor.submit(mesh_domain,points[ids[i]],np.searchsorted(ids[i],domains[i][0]),domains[i][1],
+            spacing,select,engine) for i in sorted(range(len(domains)),key=lambda i:-areas[i])}
+        results=[futures[i].result() for i in range(len(domains))]
+
+    #   Local node ids: the domain's nodes in points, then the ones it generated.
+    nodes=[points]
+    triangles=[]
+    n_nodes=len(points)
+    for ids_,(nodes_,triangles_) in zip(ids,results):
+        new=nodes_[len(ids_):]
+        triangles.append(np.concatenate([ids_,np.arange(n_nodes,n_nodes+len(new))])[triangles_])
+        nodes.append(new)
+        n_nodes+=len(new)
+    normals,plane=np.unique(np.array([normal for _,normal in domains]).reshape(-1,3),axis=0,return_inverse=True)
+    planes=np.repeat(plane.ravel(),[len(x) for _,x in results]).astype(np.int32)
+
+    return np.concatenate(nodes),np.concatenate(triangles).astype(np.int32).reshape(-1,3),planes,normals
+
+def mesh_domain(points:np.ndarray,sides:np.ndarray,normal:np.ndarray,spacing:float,select,engine:str)->tuple:
+    """
+    Meshes one domain of mesh_domains, run in a worker process. The worker does not profile, the
+    calling Mesh does.
+
+    Parameters:
+    -----------
+    points: np.ndarray; Boundary (and interface) nodes of the domain.
+    sides: np.ndarray; (k,2) rows of points, the domain on the left of a->b about normal.
+    normal: np.ndarray; Normal of the plane.
+    spacing, select, engine: As Mesh.
+
+    Returns:
+    --------
+    nodes: np.ndarray; points followed by the generated nodes.
+    triangles: np.ndarray; (M,3) rows of nodes.
+    """
+    cache=Discretisation_cache()
+    cache.add_nodes(points)
+    front=Front([Front_side(points[a],points[b],True,normal,ids=(a,b)) for a,b in sides.tolist()],boundary=cache,select=select)
+    mesh=Mesh(spacing=spacing,front=front,engine=engine,profile=False)
+
+    return mesh.nodes,mesh.triangles
+
+def read(file:str,csv=False,mmap=False,prune=True,cache=None,compact=False)->list:
     """
     Reads STEP file and gets geometry faces (or surface) on which to generate mesh.
 
     Parameters:
     ----------
     file: str; Input step file.
+    mmap: bool; Memory-map the file and only decode entities reachable from the faces.
+    prune: bool; Only build entities reachable from the faces (always the case with mmap).
+    cache: geom_cache.Geom_cache or bool; Load/store the parsed faces in an on-disk cache. True uses the default cache.
+    compact: bool; Drop raw id fields and names from the entities once resolved.
 
     Returns:
     --------
     faces: list[gometry.Advanced_face]; List of face objects to generate mesh on.
     """
-    geom_raw=Step_read(file,csv=csv)
-    geom_dict=Data_sort(geom_raw)
+    if cache==True:
+        cache=Geom_cache()
+    options={'prune':prune or mmap,'compact':compact}  #   change the stored entities, so part of the cache key
+    if cache:
+        faces=cache.load(file,options)
+        if faces is not None:
+            return faces
+
+    geom_raw=Step_read(file,csv=csv,mmap=mmap)
+    geom_dict=Data_sort(geom_raw,prune=prune,compact=compact)
+    if mmap==True:
+        geom_raw.close()    #   faces are fully resolved by Data_sort
 
     #Plot_geom(geom_dict)
     
@@ -536,9 +1778,12 @@ def read(file:str,csv=False)->list:
     if faces==[]:
         raise StepException("No face defined in input file. Input model must contain a 2D face.")
 
+    if cache:
+        cache.store(file,faces,options)
+
     return faces
 
-def init_front(faces:list,spacing:float,orientation_flip:bool)->list:
+def init_front(faces:list,spacing:float,orientation_flip:bool,deviation:float=None,min_spacing:float=None,growth:float=1.2,per_face:bool=False)->list:
     """
     Initialises advancing front with surface boundaries.
 
@@ -546,13 +1791,24 @@ def init_front(faces:list,spacing:float,orientation_flip:bool)->list:
     -----------
     faces: list[geometry.Advanced_faces]; Face (or surface) objects on which to generate mesh.
     spacing: float; Node spacing for mesh generation. Smaller -> more refined mesh.
+    deviation: float, optional; Curvature-adaptive boundary spacing, see geometry.Edge_loop.gen_nodes.
+        spacing is then the largest boundary spacing.
+    min_spacing: float, optional; Smallest adaptive boundary spacing.
+    growth: float, optional; Largest size ratio between neighbouring adaptive boundary elements.
+    per_face: bool, optional; One front per face instead, all on the same boundary cache, for meshing
+        the faces in parallel (Mesh with a list of fronts).
 
     Returns:
     -------
-    front: Front; Front object containing sides on boundaries of geometry.
+    front: Front; Front object containing sides on boundaries of geometry. Edges shared by several faces
+        are discretised once, their sides carry the same boundary node ids (front.boundary). A list of
+        fronts with per_face.
     """
+    cache=Discretisation_cache()
     sides=[]
+    starts=[]   #   first side of each face
     for face in faces:
+        starts.append(len(sides))
         vect_out_plane=face.plane.axis.axis
         for bound in face.bounds:
 
@@ -561,18 +1817,41 @@ def init_front(faces:list,spacing:float,orientation_flip:bool)->list:
                 orientation=False
 
             edge_loop=bound.edge_loop
-            nodes=edge_loop.gen_nodes(spacing)
+            ids=edge_loop.node_ids(spacing,deviation,min_spacing,growth,cache)
+            nodes=cache.nodes[ids]
 
             for i in range(len(nodes)-1):
-                sides.append(Front_side(nodes[i],nodes[i+1],orientation,vect_out_plane))
+                sides.append(Front_side(nodes[i],nodes[i+1],orientation,vect_out_plane,ids=(ids[i],ids[i+1])))
+
+    if per_face:
+        #   Built once every face is discretised, so each front has all the node ids.
+        return [Front(sides[a:b],boundary=cache) for a,b in zip(starts,starts[1:]+[len(sides)])]
 
-    front=Front(sides)
+    front=Front(sides,boundary=cache)
 
     return front
 
+def warmup()->None:
+    """
+    Compiles (or loads from the on-disk numba cache) the JIT kernels, so the first mesh does not
+    pay for it. Run once after install with `python mesh.py --warmup`.
+    """
+    nodes=np.zeros([2,3])
+    Mesh.find_near_nodes(nodes[0],nodes,1.)
+
+    points=np.array([[0.,0.,0.],[1.,0.,0.],[0.5,0.8,0.]])
+    side_nodes=np.array([[0,1],[1,2],[2,0]],dtype=np.int64)
+    advance_front(points,3,side_nodes,np.ones(3,dtype=bool),np.zeros(3,dtype=np.int64),np.array([[0.,0.,1.]]),np.zeros(3,dtype=np.int64),1.,0,16)
+
+    return None
+
 if __name__=="__main__":
-    #system('cls')
-    
+    if "--warmup" in sys.argv:
+        warmup()
+        sys.exit()
+
+    from plot_tools import Plot_panels
+
     faces=read('NACA0012H.stp',csv=False)
     print("read")
     spacing=3
@@ -0,0 +1,228 @@
+import os
+import pickle
+import shutil
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+import mesh as mesh_module
+from mesh import Mesh, read, init_front, Front, Front_side, plane_axes, SELECTION_CODES
+from geom_cache import Geom_cache
+from fixtures import Mesh_defects, Write_grid_step
+
+HERE=os.path.dirname(os.path.abspath(__file__))
+
+def Face_state(value):
+    """Comparable form of a face tree: entities by all their fields, recursively, arrays as lists."""
+    if hasattr(type(value),'__slots__'):
+        return (type(value).__name__,{name:Face_state(getattr(value,name,None)) for name in type(value).__slots__})
+    if isinstance(value,np.ndarray):
+        return value.tolist()
+    if isinstance(value,(list,tuple)):
+        return [Face_state(x) for x in value]
+    if hasattr(value,'__dict__'):   #   e.g. scipy BSpline
+        return (type(value).__name__,{k:Face_state(v) for k,v in vars(value).items()})
+
+    return value
+
+def test_pruned_read_same_faces():
+    for file in ('square_loop.stp','circle.stp','shape.stp'):
+        file=os.path.join(HERE,file)
+
+        assert Face_state(read(file,prune=True))==Face_state(read(file,prune=False))
+
+def test_cache_keeps_read_options_apart(tmp_path):
+    cache=Geom_cache(str(tmp_path/'cache'))
+    file=os.path.join(HERE,'shape.stp')
+    full=Face_state(read(file))
+    compact=Face_state(read(file,compact=True))
+
+    for _ in range(2):  #   store, then load
+        assert Face_state(read(file,cache=cache,compact=True))==compact
+        assert Face_state(read(file,cache=cache,compact=False))==full
+        assert Face_state(read(file,cache=cache,prune=False))==full
+    assert len(os.listdir(tmp_path/'cache'))==3
+
+def test_cache_compact_read(tmp_path):
+    cache=Geom_cache(str(tmp_path/'cache'))
+    file=os.path.join(HERE,'shape.stp')
+    expected=init_front(read(file),spacing=1,orientation_flip=True)
+
+    read(file,cache=cache,compact=True)
+    path=cache.path(cache.key(file,{'prune':True,'compact':True}))
+    with open(path,'rb') as f:
+        assert pickle.load(f)['options']=={'prune':True,'compact':True}
+
+    #   a compact entry meshes the same boundary as a full read
+    faces=read(file,cache=cache,compact=True)
+    assert all(bound.edge_loop.edge_ids is None for face in faces for bound in face.bounds)
+    front=init_front(faces,spacing=1,orientation_flip=True)
+    assert np.array_equal(front.boundary.nodes,expected.boundary.nodes)
+
+    #   an entry recorded with other options is a miss, even under the full read's key
+    shutil.copy(path,cache.path(cache.key(file,{'prune':True,'compact':False})))
+    assert cache.load(file,{'prune':True,'compact':False}) is None
+    assert Face_state(read(file,cache=cache))==Face_state(read(file))
+
+def test_compact_read_same_boundary():
+    for file in ('square_loop.stp','circle.stp','shape.stp'):
+        fronts=[init_front(read(os.path.join(HERE,file),compact=compact),spacing=1,orientation_flip=True) for compact in (False,True)]
+
+        assert np.array_equal(fronts[0].boundary.nodes,fronts[1].boundary.nodes)
+        assert np.array_equal(fronts[0].side_nodes[:fronts[0].n_slots],fronts[1].side_nodes[:fronts[1].n_slots])
+        assert len(fronts[0].boundary.vertices)==len(fronts[1].boundary.vertices)
+
+def test_edges_cross_off_xy_plane():
+    #   current side a-b, a wall, and a node c behind the wall, drawn in the xz plane then rotated onto others
+    points=np.array([[0.,0.,0.],[0.,0.,1.],[1.,0.,-1.],[1.,0.,2.],[2.,0.,0.5],[3.,0.,0.5]])
+    rotations=[np.eye(3),np.array([[1.,0.,0.],[0.,0.,1.],[0.,-1.,0.]]),np.array([[0.,1.,0.],[1.,0.,0.],[0.,0.,-1.]])]
+    for rotation in rotations:
+        rotated=points@rotation.T
+        normal=np.array([0.,1.,0.])@rotation.T
+        for wall,expected in ((True,True),(False,False)):
+            pairs=[(0,1),(4,5)]+([(2,3)] if wall else [])
+            front=Front([Front_side(rotated[i],rotated[j],orientation=False,vect_out_plane=normal) for i,j in pairs])
+            a,b=front.side(0).ids
+            c=front.side(1).ids[0]
+
+            assert front.edges_cross(a,b,np.array([c]),1.,plane_axes(normal)).tolist()==[expected]
+
+def test_engines_same_mesh(tmp_path,monkeypatch):
+    monkeypatch.chdir(tmp_path)     #   Mesh writes profile.txt
+    for file in ('circle.stp','square_loop.stp'):
+        faces=read(os.path.join(HERE,file))
+        for spacing in (2.,1.5):
+            for select in SELECTION_CODES:
+                meshes=[Mesh(spacing=spacing,front=init_front(faces,spacing=spacing,orientation_flip=True),select=select,engine=engine)
+                        for engine in ('python','numba')]
+
+                assert np.array_equal(meshes[0].nodes,meshes[1].nodes)
+                assert np.array_equal(meshes[0].triangles,meshes[1].triangles)
+                assert np.array_equal(meshes[0].planes,meshes[1].planes)
+
+def test_engines_same_mesh_right_constraint():
+    #   Side (1,2) is narrower than 60 degrees at B, with no node near its ideal node: case 1b puts the new
+    #   node on the hypotenuse, its right constraint.
+    points=[np.array(point,dtype=float) for point in ((0,0,0),(1,0,0),(2,0,0),(0,2.5,0),(0,1.5,0),(0,0.5,0))]
+    meshes=[Mesh(spacing=1.,front=Front([Front_side(points[i],points[(i+1)%len(points)],orientation=True,vect_out_plane=np.array([0.,0.,1.]))
+                                         for i in range(len(points))]),engine=engine,profile=False)
+            for engine in ('python','numba')]
+
+    assert np.array_equal(meshes[0].nodes,meshes[1].nodes)
+    assert np.array_equal(meshes[0].triangles,meshes[1].triangles)
+    a,b,c=meshes[0].triangles[1]
+    assert (a,b)==(1,2)
+    assert np.isclose(np.cross(meshes[0].nodes[c]-points[2],points[3]-points[2])[2],0)
+
+def Edge_counts(triangles:np.ndarray)->dict:
+    edges=np.sort(np.concatenate([triangles[:,[0,1]],triangles[:,[1,2]],triangles[:,[2,0]]]),axis=1)
+    edges,counts=np.unique(edges,axis=0,return_counts=True)
+
+    return dict(zip(map(tuple,edges.tolist()),counts.tolist()))
+
+def Panel_areas(mesh:Mesh)->np.ndarray:
+    """Areas of the panels, signed positive for panels wound anticlockwise about their plane normal."""
+    A,B,C=(mesh.nodes[mesh.triangles[:,i]] for i in range(3))
+    return np.einsum('ij,ij->i',np.cross(B-A,C-A),mesh.normals[mesh.planes])/2
+
+def test_new_node_pulled_below_channel_side():
+    #   The channel is narrower than an ideal panel and its top is one side reaching past the search radius:
+    #   the new nodes off the bottom sides are pulled in below it instead of being placed across it.
+    points=[np.array(point,dtype=float) for point in ((-1.5,0,0),(-0.5,0,0),(0.5,0,0),(1.5,0,0),(2.5,0,0),(2.5,0.5,0),(-1.5,0.5,0))]
+    for engine in ('python','numba'):
+        mesh=Mesh(spacing=1.,front=Front([Front_side(points[i],points[(i+1)%len(points)],orientation=True,vect_out_plane=np.array([0.,0.,1.]))
+                                          for i in range(len(points))]),engine=engine,profile=False)
+
+        assert np.all((mesh.nodes[:,1]>=0)&(mesh.nodes[:,1]<=0.5))
+        areas=Panel_areas(mesh)
+        assert np.all(areas>0)
+        assert np.isclose(areas.sum(),4*0.5)
+
+def test_domains_conforming():
+    #   spacings where the split gives this many domains and case 1b leaves no hanging node in any of them
+    for file,spacing,domains in (('circle.stp',1.,2),('circle.stp',1.,3),('circle.stp',1.,4),
+                                 ('square_loop.stp',1.6,2),('square_loop.stp',1.4,3),('square_loop.stp',1.4,4)):
+        faces=read(os.path.join(HERE,file))
+        serial=Mesh(spacing=spacing,front=init_front(faces,spacing=spacing,orientation_flip=True),engine='numba',profile=False)
+        front=init_front(faces,spacing=spacing,orientation_flip=True)
+        boundary=set(map(tuple,np.sort(front.side_nodes[np.flatnonzero(front.alive[:front.n_slots])],axis=1).tolist()))
+        mesh=Mesh(spacing=spacing,front=front,engine='numba',domains=domains,workers=2,profile=False)
+
+        counts=Edge_counts(mesh.triangles)
+        assert all(counts.get(edge)==1 for edge in boundary)
+        assert all(count==2 for edge,count in counts.items() if edge not in boundary)
+        assert len(np.unique(mesh.nodes,axis=0))==len(mesh.nodes)
+        areas=Panel_areas(mesh)
+        assert np.all(areas>0)
+        assert np.isclose(areas.sum(),Panel_areas(serial).sum(),rtol=1e-9)
+
+def test_faces_share_edge_nodes(tmp_path):
+    file=os.path.join(tmp_path,'grid.stp')
+    Write_grid_step(file,2)
+    fronts=init_front(read(file),spacing=1.,orientation_flip=True,per_face=True)
+    sides=[set(map(tuple,front.side_nodes[np.flatnonzero(front.alive[:front.n_slots])].tolist())) for front in fronts]
+    boundary=np.concatenate([np.array(sorted(x)) for x in sides])
+    points=fronts[0].points[:fronts[0].n_points].copy()
+    mesh=Mesh(spacing=1.,front=fronts,engine='numba',workers=2,profile=False)
+
+    assert Mesh_defects(mesh.nodes,mesh.triangles,boundary)==0
+    assert np.array_equal(mesh.nodes[:len(points)],points)
+
+    #   each shared edge is a side of both faces, on the same node ids run opposite ways, and on one panel of each
+    counts=Edge_counts(mesh.triangles)
+    for i in range(len(fronts)):
+        for j in range(i+1,len(fronts)):
+            shared=[(a,b) for a,b in sides[i] if (b,a) in sides[j]]
+            assert len(shared)==(10 if i+j!=3 else 0)  #   faces 0,3 and 1,2 only meet at the centre
+            assert all(counts[tuple(sorted(side))]==2 for side in shared)
+
+class Recording_executor():
+    """ProcessPoolExecutor stand-in running jobs in submission order, recording the domain areas."""
+    areas=[]
+
+    def __init__(self,workers):
+        Recording_executor.areas=[]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        return False
+
+    def submit(self,function,points,sides,normal,*args):
+        Recording_executor.areas.append(0.5*float(np.cross(points[sides[:,0]],points[sides[:,1]]).sum(axis=0)@normal))
+        future=Future()
+        future.set_result(function(points,sides,normal,*args))
+
+        return future
+
+def test_domains_largest_first(monkeypatch):
+    faces=read(os.path.join(HERE,'circle.stp'))
+    expected=Mesh(spacing=1.,front=init_front(faces,spacing=1.,orientation_flip=True),engine='numba',domains=3,workers=1,profile=False)
+
+    monkeypatch.setattr(mesh_module,'ProcessPoolExecutor',Recording_executor)
+    mesh=Mesh(spacing=1.,front=init_front(faces,spacing=1.,orientation_flip=True),engine='numba',domains=3,profile=False)
+
+    areas=Recording_executor.areas
+    assert len(areas)==3 and areas[0]>areas[-1]
+    assert areas==sorted(areas,reverse=True)
+    #   node numbering follows the domain order, not the order they were meshed in
+    assert np.array_equal(mesh.nodes,expected.nodes)
+    assert np.array_equal(mesh.triangles,expected.triangles)
+
+def test_parallel_needs_named_selection(monkeypatch):
+    def No_pool(*args,**kwargs):
+        raise AssertionError("no worker processes should start")
+    monkeypatch.setattr(mesh_module,'ProcessPoolExecutor',No_pool)
+
+    faces=read(os.path.join(HERE,'circle.stp'))
+    longest=lambda front,slot:-float(np.linalg.norm(np.diff(front.points[front.side_nodes[slot]],axis=0)))
+    for front,domains in ((init_front(faces,spacing=1.,orientation_flip=True),2),
+                          (init_front(faces,spacing=1.,orientation_flip=True,per_face=True),None)):
+        with pytest.raises(ValueError,match="named selection"):
+            Mesh(spacing=1.,front=front,select=longest,domains=domains,profile=False)
+
+    #   run serially the same key is fine
+    mesh=Mesh(spacing=1.,front=init_front(faces,spacing=1.,orientation_flip=True),select=longest,profile=False)
+    assert len(mesh.triangles)
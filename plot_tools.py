@@ -74,7 +74,7 @@ def Plot_geom(geom_dict:dict,cartesian_points:bool=True,
                    polylines:bool=True,circles:bool=True,
                    bsplines:bool=True,lines=True):
     
-    points      = [x for x in geom_dict.values() if type(x).__name__=='Cartesian_point']
+    points      = [geom_dict[x] for x in geom_dict.points.ids[geom_dict.points.kinds==0].tolist()]
     lines_      = [x for x in geom_dict.values() if type(x).__name__=='Line']
     polylines_  = [x for x in geom_dict.values() if type(x).__name__=='Polyline']
     circles_    = [x for x in geom_dict.values() if type(x).__name__=='Circle']